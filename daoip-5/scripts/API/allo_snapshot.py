@@ -0,0 +1,159 @@
+"""
+Materialize Allo Protocol rounds and applications as static DAOIP-5 files.
+
+Writes grants_pool.json and one <chainId>-<roundId>_applications_uri.json per
+round into daoip-5/json/allo, in the same layout CSV-to-JSON.py produces, so
+the files are served by the static routes and indexed by /search.
+
+A state file records a fingerprint of every round. Later runs only re-fetch
+the applications of rounds whose fingerprint changed, plus rounds that are
+still open for applications.
+"""
+import argparse
+import hashlib
+import json
+import os
+
+from x_to_DAOIP5.allo_to_DAOIP5 import (
+    GRANT_POOLS_QUERY,
+    get_grant_pool_name,
+    iter_application_pages,
+    map_application,
+    map_grant_pool,
+    query_allo,
+)
+
+OUTPUT_FOLDER = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../json/allo'))
+STATE_FILE = '.snapshot-state'
+RAW_BASE_URL = "https://raw.githubusercontent.com/opensource-observer/oss-funding/refs/heads/main/daoip-5/json/allo"
+PAGE_SIZE = 100
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='Snapshot Allo rounds and applications into DAOIP-5 JSON files')
+    parser.add_argument('--output', type=str, default=OUTPUT_FOLDER, help='Folder to write the DAOIP-5 files to')
+    parser.add_argument('--max-rounds', type=int, default=None, help='Only snapshot the first N rounds')
+    parser.add_argument('--concurrency', type=int, default=4, help='Concurrent page requests per round')
+    parser.add_argument('--force', action='store_true', help='Re-fetch every round, ignoring the saved state')
+    return parser.parse_args()
+
+
+def fetch_rounds(max_rounds=None):
+    """
+    Page through every round known to the indexer.
+    """
+    rounds = []
+    offset = 0
+    while max_rounds is None or len(rounds) < max_rounds:
+        page = query_allo(GRANT_POOLS_QUERY, {"first": PAGE_SIZE, "offset": offset}).get("rounds", [])
+        rounds.extend(page)
+        if len(page) < PAGE_SIZE:
+            break
+        offset += PAGE_SIZE
+    return rounds[:max_rounds]
+
+
+def round_fingerprint(round_data):
+    return hashlib.sha256(json.dumps(round_data, sort_keys=True).encode()).hexdigest()
+
+
+def round_file_name(round_data):
+    return f"{round_data['chainId']}-{round_data['id']}_applications_uri.json"
+
+
+def write_if_changed(path, content):
+    """
+    Write content to path unless the file already holds exactly that content.
+    """
+    if os.path.exists(path):
+        with open(path, 'r') as f:
+            if f.read() == content:
+                return False
+    with open(path, 'w') as f:
+        f.write(content)
+    return True
+
+
+def generate_application_uri(round_data, concurrency):
+    """
+    Fetch every application in a round and build its applications document.
+    """
+    round_id = round_data['id']
+    applications = []
+    for page in iter_application_pages(round_id, PAGE_SIZE, concurrency, chain_id=round_data['chainId']):
+        applications.extend(page)
+
+    document = {
+        "@context": "http://www.daostar.org/schemas",
+        "name": "Allo Protocol",
+        "type": "Entity",
+        "grant_pools": [
+            {
+                "type": "GrantPool",
+                "name": get_grant_pool_name(applications, round_id),
+                "applications": [map_application(app, round_id) for app in applications]
+            }
+        ]
+    }
+    return json.dumps(document, indent=4)
+
+
+def generate_grant_pool_json(rounds):
+    grant_pool_json = {
+        "@context": "http://www.daostar.org/schemas",
+        "name": "Allo Protocol",
+        "type": "Entity",
+        "grantPools": []
+    }
+    for round_data in rounds:
+        grant_pool = map_grant_pool(round_data)
+        grant_pool["applicationsURI"] = f"{RAW_BASE_URL}/{round_file_name(round_data)}"
+        grant_pool_json["grantPools"].append(grant_pool)
+    return json.dumps(grant_pool_json, indent=4)
+
+
+def load_state(path):
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+if __name__ == "__main__":
+    args = parse_arguments()
+    os.makedirs(args.output, exist_ok=True)
+    state_path = os.path.join(args.output, STATE_FILE)
+    state = {} if args.force else load_state(state_path)
+
+    rounds = fetch_rounds(args.max_rounds)
+    print(f"Found {len(rounds)} rounds")
+
+    fetched = 0
+    for round_data in rounds:
+        key = f"{round_data['chainId']}-{round_data['id']}"
+        fingerprint = round_fingerprint(round_data)
+        file_name = os.path.join(args.output, round_file_name(round_data))
+        is_open = map_grant_pool(round_data)["isOpen"]
+
+        if not is_open and state.get(key) == fingerprint and os.path.exists(file_name):
+            continue
+
+        try:
+            content = generate_application_uri(round_data, args.concurrency)
+        except Exception as e:
+            print(f"Skipping round {key}: {e}")
+            continue
+
+        fetched += 1
+        if write_if_changed(file_name, content):
+            print(f"Applications URI JSON has been generated and saved to {file_name}")
+        state[key] = fingerprint
+
+    grants_pool_file_name = os.path.join(args.output, 'grants_pool.json')
+    if write_if_changed(grants_pool_file_name, generate_grant_pool_json(rounds)):
+        print(f"Grants Pool JSON has been generated and saved to {grants_pool_file_name}")
+
+    with open(state_path, 'w') as f:
+        json.dump(state, f, indent=4, sort_keys=True)
+    print(f"Fetched applications for {fetched} of {len(rounds)} rounds")
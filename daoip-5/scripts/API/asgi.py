@@ -0,0 +1,201 @@
+"""
+ASGI entry point for the DAOIP-5 Datalake API.
+
+Serves the same endpoints and response bodies as the Flask app in run.py,
+but on an event loop: requests to the Allo indexer are awaited on a shared
+async connection pool instead of holding a worker thread each, and file
+system and search work runs in a thread pool. Run it with:
+
+    uvicorn asgi:app --host 0.0.0.0 --port 5000
+"""
+import json
+from contextlib import asynccontextmanager
+
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import FileResponse, HTMLResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+from catalog import is_not_modified, validator_headers
+from run import display_help, funding_aggregate, get_file_entry, get_grant_pools, list_grant_systems, search_applications
+from x_to_DAOIP5.allo_to_DAOIP5 import (
+    ALLO_DOCS,
+    APPLICATIONS_QUERY,
+    BULK_CONCURRENCY,
+    BULK_PAGE_SIZE,
+    GRANT_POOLS_QUERY,
+    afetch_allo_data,
+    aiter_application_pages,
+    allo_cache,
+    applications_filter,
+    applications_response,
+    async_allo_client,
+    bulk_document_head,
+    bulk_document_item,
+    bulk_document_tail,
+    grant_pools_response,
+)
+
+
+class JSONResponse(Response):
+    """
+    JSON response encoded the way Flask's jsonify encodes it, so that both
+    apps return byte-identical bodies.
+    """
+    media_type = "application/json"
+
+    def render(self, content):
+        return (json.dumps(content, sort_keys=True, separators=(",", ":")) + "\n").encode("utf-8")
+
+
+def help_page(request):
+    html, status, headers = display_help()
+    return HTMLResponse(html, status, headers)
+
+
+def grant_systems(request):
+    try:
+        return JSONResponse(list_grant_systems())
+    except Exception as e:
+        return JSONResponse({"error": str(e)}, 500)
+
+
+def grant_pools(request):
+    try:
+        return JSONResponse(get_grant_pools(request.path_params["grant_system"]))
+    except Exception as e:
+        return JSONResponse({"error": str(e)}, 500)
+
+
+def json_file(request):
+    """
+    Same as run.proxy_json_file: content-hash ETag, 304 for conditional
+    requests, Range support and precompressed variants.
+    """
+    try:
+        entry = get_file_entry(
+            request.path_params["grant_system"], f"{request.path_params['filename']}.json",
+            request.headers.get("accept-encoding"),
+        )
+        headers = validator_headers(entry)
+        if is_not_modified(request.headers, entry):
+            return Response(status_code=304, headers={k: v for k, v in headers.items() if k != 'Content-Encoding'})
+        return FileResponse(entry.path, media_type="application/json", headers=headers)
+    except Exception as e:
+        return JSONResponse({"error": str(e)}, 500)
+
+
+async def search_project(request):
+    """
+    Same as run.search_project; the search runs in the thread pool.
+    """
+    body, status = await run_in_threadpool(
+        search_applications, request.path_params.get("project_name", ""), request.query_params
+    )
+    if not isinstance(body, dict):
+        return StreamingResponse(body, media_type="application/x-ndjson")
+    return JSONResponse(body, status)
+
+
+async def aggregate_funding(request):
+    """
+    Same as run.aggregate_funding; the query runs in the thread pool.
+    """
+    body, status = await run_in_threadpool(funding_aggregate, request.query_params)
+    return JSONResponse(body, status)
+
+
+async def allo_grant_pools(request):
+    first = int(request.query_params.get("first", 10))
+    offset = int(request.query_params.get("offset", 0))
+
+    api_data = await afetch_allo_data(GRANT_POOLS_QUERY, {"first": first, "offset": offset})
+    return JSONResponse(grant_pools_response(api_data, first, offset))
+
+
+async def stream_all_applications(round_id, page_size, concurrency):
+    """
+    Async counterpart of allo_to_DAOIP5.stream_all_applications.
+    """
+    pages = aiter_application_pages(round_id, page_size, concurrency)
+    try:
+        first_page = await anext(pages)
+    except Exception as e:
+        await pages.aclose()
+        return JSONResponse({"error": f"Error fetching applications: {e}"}, 502)
+
+    async def generate():
+        yield bulk_document_head(round_id, first_page)
+
+        returned = 0
+        error = None
+        page = first_page
+        try:
+            while True:
+                for app in page:
+                    yield bulk_document_item(app, round_id, returned)
+                    returned += 1
+                page = await anext(pages, None)
+                if page is None:
+                    break
+        except Exception as e:
+            print(f"Error fetching applications: {e}")
+            error = f"Error fetching applications: {e}"
+        finally:
+            await pages.aclose()
+
+        yield bulk_document_tail(page_size, returned, error)
+
+    return StreamingResponse(generate(), media_type="application/json")
+
+
+async def allo_applications(request):
+    round_id = request.query_params.get("roundId")
+    first = int(request.query_params.get("first", 10))
+    offset = int(request.query_params.get("offset", 0))
+
+    if not round_id:
+        return JSONResponse({"error": "Missing 'roundId' parameter"}, 400)
+
+    if request.query_params.get("all", "").lower() == "true":
+        page_size = int(request.query_params.get("first", BULK_PAGE_SIZE))
+        if page_size <= 0:
+            return JSONResponse({"error": "'first' must be positive"}, 400)
+        return await stream_all_applications(round_id, page_size, BULK_CONCURRENCY)
+
+    variables = {"filter": applications_filter(round_id), "first": first, "offset": offset}
+    api_data = await afetch_allo_data(APPLICATIONS_QUERY, variables)
+    return JSONResponse(applications_response(api_data, round_id, first, offset))
+
+
+async def allo_metrics(request):
+    return JSONResponse({"upstream": async_allo_client.stats(), "cache": allo_cache.stats()})
+
+
+async def allo_docs(request):
+    return JSONResponse(ALLO_DOCS)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    yield
+    await async_allo_client.aclose()
+
+
+# Explicit routes come before the /<grant_system> catch-alls, which would
+# otherwise match them.
+routes = [
+    Route('/help', help_page, methods=['GET']),
+    Route('/search/', search_project, methods=['GET']),
+    Route('/search/{project_name}', search_project, methods=['GET']),
+    Route('/funding/aggregate', aggregate_funding, methods=['GET']),
+    Route('/allo/grant_pools.json', allo_grant_pools, methods=['GET']),
+    Route('/allo/applications', allo_applications, methods=['GET']),
+    Route('/allo/metrics', allo_metrics, methods=['GET']),
+    Route('/allo/', allo_docs, methods=['GET']),
+    Route('/', grant_systems, methods=['GET']),
+    Route('/{grant_system}', grant_pools, methods=['GET']),
+    Route('/{grant_system}/{filename}.json', json_file, methods=['GET']),
+]
+
+app = Starlette(routes=routes, lifespan=lifespan)
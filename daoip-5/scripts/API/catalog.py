@@ -0,0 +1,179 @@
+import hashlib
+import os
+import threading
+import time
+from collections import namedtuple
+from email.utils import formatdate, parsedate_to_datetime
+
+# How often (in seconds) the directory listings are re-read
+REFRESH_INTERVAL = 2.0
+HASH_CHUNK_SIZE = 1 << 20
+# Precompressed siblings written by CSV-to-JSON.py --compress, in order of preference
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+# encoding is the Content-Encoding of the file at path, or None for the plain JSON
+FileEntry = namedtuple('FileEntry', ['path', 'etag', 'mtime', 'size', 'encoding'], defaults=[None])
+
+
+def file_etag(path):
+    """
+    Strong ETag for a file: the SHA-256 of its content.
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def accepted_encodings(accept_encoding):
+    """
+    Parse an Accept-Encoding header into the set of codings with a non-zero q.
+    """
+    accepted = set()
+    for item in (accept_encoding or '').split(','):
+        coding, _, params = item.strip().partition(';')
+        try:
+            q = float(params.strip()[2:]) if params.strip().startswith('q=') else 1.0
+        except ValueError:
+            continue
+        if coding and q > 0:
+            accepted.add(coding.strip().lower())
+    if '*' in accepted:
+        accepted.update(encoding for encoding, _ in ENCODINGS)
+    return accepted
+
+
+def validator_headers(entry):
+    """
+    ETag, Last-Modified, Cache-Control, Vary and Content-Encoding headers for
+    a catalog file. Clients may cache the file but must revalidate it on
+    every use.
+    """
+    headers = {
+        'ETag': f'"{entry.etag}"',
+        'Last-Modified': formatdate(entry.mtime, usegmt=True),
+        'Cache-Control': 'no-cache',
+        'Vary': 'Accept-Encoding',
+    }
+    if entry.encoding:
+        headers['Content-Encoding'] = entry.encoding
+    return headers
+
+
+def is_not_modified(headers, entry):
+    """
+    Evaluate If-None-Match / If-Modified-Since request headers against a
+    catalog file. If-None-Match takes precedence when both are present.
+    """
+    if_none_match = headers.get('if-none-match')
+    if if_none_match is not None:
+        tags = [tag.strip().removeprefix('W/') for tag in if_none_match.split(',')]
+        return '*' in tags or f'"{entry.etag}"' in tags
+
+    if_modified_since = headers.get('if-modified-since')
+    if if_modified_since is not None:
+        try:
+            return int(entry.mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+class Catalog:
+    """
+    In-process catalog of the DAOIP-5 JSON tree.
+
+    Grant system folders and the JSON files in them are listed once and
+    re-read at most every REFRESH_INTERVAL seconds, so listing endpoints do
+    not touch the file system on every request. File lookups cost a single
+    stat; the content hash used as ETag is only recomputed when a file's
+    modification time or size changes.
+
+    When the client accepts it, a precompressed .br or .gz sibling is served
+    instead of the JSON file, as long as it is not older than the file.
+    """
+
+    def __init__(self, base_path, refresh_interval=REFRESH_INTERVAL):
+        self.base_path = base_path
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self._checked_at = 0.0
+        # (systems, {system: json_files}) is swapped as a whole on refresh
+        self._snapshot = ([], {})
+        self._etags = {}
+
+    def _scan(self):
+        systems = [folder for folder in os.listdir(self.base_path) if os.path.isdir(os.path.join(self.base_path, folder))]
+        pools = {}
+        for system in systems:
+            try:
+                files = os.listdir(os.path.join(self.base_path, system))
+            except OSError:
+                continue
+            pools[system] = [file for file in files if file.endswith('.json')]
+        return systems, pools
+
+    def refresh(self, force=False):
+        """
+        Re-read the directory listings if they are older than refresh_interval.
+        """
+        now = time.monotonic()
+        if not force and now - self._checked_at < self.refresh_interval:
+            return
+
+        with self._lock:
+            if not force and now - self._checked_at < self.refresh_interval:
+                return
+            self._snapshot = self._scan()
+            self._checked_at = time.monotonic()
+
+    def grant_systems(self):
+        """
+        List all grant system folders.
+        """
+        self.refresh()
+        return list(self._snapshot[0])
+
+    def grant_pools(self, grant_system):
+        """
+        List the JSON files in a grant system folder, or None if it does not exist.
+        """
+        self.refresh()
+        files = self._snapshot[1].get(grant_system)
+        return None if files is None else list(files)
+
+    def file_entry(self, grant_system, filename, accept_encoding=None):
+        """
+        Look up a JSON file in a grant system folder, or None if it does not exist.
+        Returns the best precompressed variant allowed by accept_encoding.
+        """
+        files = self.grant_pools(grant_system)
+        if files is None or filename not in files:
+            return None
+
+        path = os.path.join(self.base_path, grant_system, filename)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+
+        cached = self._etags.get(path)
+        if cached is not None and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+            etag = cached[2]
+        else:
+            etag = file_etag(path)
+            self._etags[path] = (stat.st_mtime_ns, stat.st_size, etag)
+
+        accepted = accepted_encodings(accept_encoding)
+        for encoding, suffix in ENCODINGS:
+            if encoding not in accepted:
+                continue
+            try:
+                variant_stat = os.stat(path + suffix)
+            except OSError:
+                continue
+            if variant_stat.st_mtime_ns >= stat.st_mtime_ns:
+                return FileEntry(path + suffix, f"{etag}-{encoding}", stat.st_mtime, variant_stat.st_size, encoding)
+
+        return FileEntry(path, etag, stat.st_mtime, stat.st_size)
@@ -1,6 +1,9 @@
-from flask import Flask, jsonify, abort, redirect, redirect, send_file
+from flask import Flask, Response, jsonify, abort, redirect, redirect, request, send_file
 import os
+import sys
 from x_to_DAOIP5.allo_to_DAOIP5 import allo_blueprint
+from search_index import SearchIndex
+from catalog import Catalog
 #from x_to_DAOIP5.questbook_to_DAOIP5 import questbook_blueprint
 import json
 import logging
@@ -9,12 +12,25 @@ app = Flask(__name__)
 # Path to the directory where the JSON files are stored (relative to the repository)
 BASE_PATH = '../../json'
 
+# Index of all applications for /search, rebuilt when the JSON files change
+search_index = SearchIndex(BASE_PATH)
+search_index.refresh(force=True)
+
+# Cached listing of grant systems and their JSON files, with content-hash ETags
+catalog = Catalog(BASE_PATH)
+
+# Consolidated funding dataset written by src/main.py, queried by /funding/aggregate
+FUNDING_DATA_PATH = os.environ.get('FUNDING_DATA_PATH', '../../../data/funding_data.parquet')
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..', 'src'))
+from funding_query import FundingQuery
+funding_query = FundingQuery(FUNDING_DATA_PATH)
+
 
 def get_grant_systems():
     """
     List all grant systems (folders) in the json directory.
     """
-    return [folder for folder in os.listdir(BASE_PATH) if os.path.isdir(os.path.join(BASE_PATH, folder))]
+    return catalog.grant_systems()
 
 @app.route('/help', methods=['GET'])
 def display_help():
@@ -97,6 +113,11 @@ def display_help():
         <p><strong>Parameters:</strong></p>
         <ul>
             <li><strong>project_name</strong> (string, optional): The project name to search for. Must be at least 3 characters if provided.</li>
+            <li><code>limit</code> (integer, optional) - Maximum number of results to return. All matches are returned if omitted.</li>
+            <li><code>offset</code> (integer, optional, default: 0) - Number of matches to skip.</li>
+            <li>A <code>limit</code> or <code>offset</code> that is not a non-negative integer is rejected with status 400.</li>
+            <li><code>fields</code> (string, optional) - Comma-separated list of result fields to return, e.g. <code>projectName,projectId,metadata</code>.</li>
+            <li><code>format</code> (string, optional, default: json) - <code>ndjson</code> streams one result per line instead of a single JSON object.</li>
         </ul>
     </div>
     
@@ -106,9 +127,31 @@ def display_help():
             <li>message: Description of search results</li>
             <li>count: Number of matches found</li>
             <li>results: Array of matching applications with metadata</li>
+            <li>pagination: Present when <code>limit</code> or <code>offset</code> is given; contains limit, offset, returned and next_offset (null on the last page)</li>
         </ul>
     </div>
 </div>
+
+    <div class="endpoint">
+    <h2>Endpoint: /funding/aggregate</h2>
+    <p><strong>Method:</strong> GET</p>
+    <p><strong>Description:</strong> Aggregate the consolidated funding dataset (<code>data/funding_data</code>): number of grants, total amount and number of distinct projects per group.</p>
+
+    <div class="param">
+        <p><strong>Parameters:</strong></p>
+        <ul>
+            <li><code>group_by</code> (string, optional) - Comma-separated dimensions: <code>project</code>, <code>funder</code>, <code>pool</code>, <code>year</code>, <code>month</code>, <code>token_unit</code>. Without it a single total is returned.</li>
+            <li><code>project</code>, <code>funder</code>, <code>pool</code> (string, optional, repeatable) - Only include matching grants.</li>
+            <li><code>from</code>, <code>to</code> (YYYY-MM-DD, optional) - Funding date range, inclusive.</li>
+            <li><code>sort</code> (string, optional, default: -amount) - Dimension or measure (<code>grants</code>, <code>amount</code>, <code>projects</code>) to sort by; prefix with <code>-</code> for descending order.</li>
+            <li><code>limit</code> (integer, optional) - Maximum number of groups to return.</li>
+        </ul>
+    </div>
+
+    <div class="response">
+        <p><strong>Response:</strong> A JSON object with the <code>group_by</code> dimensions, the number of groups as <code>count</code> and the groups as <code>results</code>.</p>
+    </div>
+</div>
      
          <div>
     <h1>Allo Protocol DAOIP-5 API Documentation</h1>
@@ -122,6 +165,7 @@ def display_help():
     <ul>
         <li><code>first</code> (integer, optional, default: 10) - Number of applications to fetch.</li>
         <li><code>offset</code> (integer, optional, default: 0) - Offset for pagination.</li>
+        <li><code>all</code> (boolean, optional, default: false) - Fetch every application in the round, requesting pages concurrently, and stream back one merged document. <code>first</code> sets the page size (default: 100) and <code>offset</code> is ignored.</li>
         <li><code>roundId</code> (string, required) - The ID of the grant pool to fetch applications for.</li>
     </ul>
 
@@ -172,11 +216,10 @@ def get_grant_pools(grant_system):
     List all JSON files (grant pools) in a given grant system folder,
     appending 'allo' to the list,
     """
-    folder_path = os.path.join(BASE_PATH, grant_system)
-    if not os.path.exists(folder_path) or not os.path.isdir(folder_path):
+    json_files = catalog.grant_pools(grant_system)
+    if json_files is None:
         abort(404, description=f"Grant system '{grant_system}' not found")
 
-    json_files = [file for file in os.listdir(folder_path) if file.endswith('.json')]
     json_files.append("allo") # ALl explicit x_to_DAOIP5 endpoints will be appended here
     #json_files.append("questbook")  # Add Questbook endpoint
 
@@ -184,18 +227,35 @@ def get_grant_pools(grant_system):
 
 
 
+def get_file_entry(grant_system, filename, accept_encoding=None):
+    """
+    Get the catalog entry (path, ETag, mtime, size, encoding) for the specified
+    JSON file in the grant system folder, or for its precompressed variant
+    matching accept_encoding.
+    """
+    entry = catalog.file_entry(grant_system, filename, accept_encoding)
+    if entry is None:
+        abort(404, description=f"File '{filename}' not found in '{grant_system}'")
+
+    return entry
+
+
 def get_file_path(grant_system, filename):
     """
     Get the file path for the specified JSON file in the grant system folder.
     """
-    folder_path = os.path.join(BASE_PATH, grant_system)
-    file_path = os.path.join(folder_path, filename)
+    return get_file_entry(grant_system, filename).path
 
-    # Check if the file exists and is a .json file
-    if not os.path.exists(file_path) or not filename.endswith('.json'):
-        abort(404, description=f"File '{filename}' not found in '{grant_system}'")
 
-    return file_path
+def list_grant_systems():
+    """
+    List all grant systems, including the ones served by x_to_DAOIP5 endpoints.
+    """
+    grant_systems = get_grant_systems()
+    if "allo" not in grant_systems:  # allo_snapshot.py may have materialized a static allo folder
+        grant_systems.append("allo") # ALl explicit x_to_DAOIP5 endpoints will be appended here
+    #grant_systems.append("questbook")  # Add Questbook endpoint
+    return grant_systems
 
 
 @app.route('/', methods=['GET'])
@@ -204,11 +264,7 @@ def list_all_grant_systems():
     Endpoint to list all grant systems (folders).
     """
     try:
-        grant_systems = get_grant_systems()
-        grant_systems.append("allo") # ALl explicit x_to_DAOIP5 endpoints will be appended here
-        #grant_systems.append("questbook")  # Add Questbook endpoint
-
-        return jsonify(grant_systems), 200
+        return jsonify(list_grant_systems()), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -229,14 +285,98 @@ def list_grant_pools(grant_system):
 def proxy_json_file(grant_system, filename):
     """
     Endpoint to serve a specific JSON file from a grant system folder (acting as a proxy).
+    Responses carry a strong content-hash ETag and Last-Modified, answer
+    conditional requests with 304 and support Range requests. Precompressed
+    .br/.gz siblings are served to clients that accept them.
     """
     try:
-        file_path = get_file_path(grant_system, f"{filename}.json")
-        return send_file(file_path, mimetype='application/json')
+        entry = get_file_entry(grant_system, f"{filename}.json", request.headers.get('Accept-Encoding'))
+        response = send_file(entry.path, mimetype='application/json', etag=entry.etag, last_modified=entry.mtime)
+        response.vary.add('Accept-Encoding')
+        if entry.encoding:
+            response.content_encoding = entry.encoding
+        return response
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
+def project_fields(result, fields):
+    """
+    Keep only the requested top-level fields of a search result.
+    """
+    if not fields:
+        return result
+    return {field: result[field] for field in fields if field in result}
+
+
+def arg_int(params, name, default=None):
+    """
+    Read a non-negative integer query parameter, or default when it is
+    missing.
+
+    Raises:
+        ValueError: If the parameter is not a non-negative integer
+    """
+    value = params.get(name)
+    if value is None:
+        return default
+    if not value.isdigit():
+        raise ValueError(f"'{name}' must be a non-negative integer")
+    return int(value)
+
+
+def search_applications(project_name, params):
+    """
+    Run a /search query for request query parameters (any mapping). Returns
+    the response body and status code; with `format=ndjson` the body of a
+    successful search is an iterator of NDJSON lines instead of a dict.
+    """
+    try:
+        limit = arg_int(params, "limit")
+        offset = arg_int(params, "offset", 0)
+    except ValueError:
+        return {"error": "'limit' and 'offset' must be non-negative integers", "status": "error"}, 400
+
+    try:
+        fields = [f for f in params.get("fields", "").split(",") if f]
+        output_format = params.get("format", "json")
+
+        if output_format not in ("json", "ndjson"):
+            return {"error": "'format' must be 'json' or 'ndjson'", "status": "error"}, 400
+
+        results = search_index.search(project_name)
+        total = len(results)
+        end = total if limit is None else offset + limit
+        page = (project_fields(result, fields) for result in results[offset:end])
+
+        if output_format == "ndjson":
+            return (json.dumps(result) + "\n" for result in page), 200
+
+        page = list(page)
+        search_description = "all applications" if not project_name else f"applications for project: {project_name}"
+        response = {
+            "message": f"Found {total} {search_description}",
+            "count": total,
+            "results": page
+        }
+        if limit is not None or offset:
+            response["pagination"] = {
+                "limit": limit,
+                "offset": offset,
+                "returned": len(page),
+                "next_offset": offset + len(page) if offset + len(page) < total else None,
+            }
+        return response, 200
+
+    except Exception as e:
+        error_description = "all applications" if not project_name else f"project: {project_name}"
+        logging.error(f"Search failed for {error_description}: {str(e)}")
+        return {
+            "error": f"Search failed for {error_description}: {str(e)}",
+            "status": "error"
+        }, 500
+
+
 @app.route('/search/', defaults={'project_name': ''})
 @app.route('/search/<project_name>')
 def search_project(project_name):
@@ -244,86 +384,64 @@ def search_project(project_name):
     Endpoint to search for all applications matching a project name across all grant systems.
     If no project name or empty string is provided, returns all applications.
 
+    Query parameters `limit` and `offset` page through the matches, `fields`
+    selects a comma-separated subset of each result's fields and
+    `format=ndjson` streams one result per line instead of a JSON document.
+
     Args:
         project_name (str): The name of the project to search for (optional)
     Returns:
         JSON object containing matching applications and result count
     """
+    body, status = search_applications(project_name, request.args)
+    if not isinstance(body, dict):
+        return Response(body, mimetype="application/x-ndjson")
+    return jsonify(body), status
+
+def funding_aggregate(params):
+    """
+    Run a /funding/aggregate query for request query parameters (any
+    multi-dict with get/getlist). Returns the response body and status code.
+    """
+    group_by = [key for key in params.get('group_by', '').split(',') if key]
     try:
-        results = []
-        # Use existing function to get grant systems
-        grant_systems = get_grant_systems()
-
-        for system in grant_systems:
-            # Use existing function to get grant pools
-            files = get_grant_pools(system)
-            applications_files = [f for f in files if 'applications' in f]
-
-            for file in applications_files:
-                try:
-                    # Use existing function to get file path and Flask's send_file
-                    file_path = get_file_path(system, file)
-                    with open(file_path, 'r') as f:
-                        data = json.load(f)
-
-                    if not isinstance(data, dict) or 'grant_pools' not in data:
-                        continue
-
-                    for pool in data['grant_pools']:
-                        if not isinstance(pool, dict) or 'applications' not in pool:
-                            continue
-
-                        for app in pool['applications']:
-                            # If project_name is empty or None, include all applications
-                            if not project_name:
-                                result = {
-                                    **app,
-                                    'metadata': {
-                                        'grantSystem': system,
-                                        'sourceFile': file,
-                                        'grantPoolId': app.get('grantPoolId', 'unknown'),
-                                        'grantPoolName': app.get('grantPoolName', 'unknown')
-                                    }
-                                }
-                                results.append(result)
-                            else:
-                                # More robust project name matching for specific search
-                                project_name_match = str(app.get('projectName', '')).lower()
-                                project_id_match = str(app.get('projectId', '')).lower()
-                                search_term = project_name.lower()
-
-                                if search_term in project_name_match or search_term in project_id_match:
-                                    result = {
-                                        **app,
-                                        'metadata': {
-                                            'grantSystem': system,
-                                            'sourceFile': file,
-                                            'grantPoolId': app.get('grantPoolId', 'unknown'),
-                                            'grantPoolName': app.get('grantPoolName', 'unknown')
-                                        }
-                                    }
-                                    results.append(result)
-
-                except (json.JSONDecodeError, Exception) as e:
-                    # Log the error but continue processing other files
-                    logging.error(f"Error processing {file} in {system}: {str(e)}")
-                    continue
+        limit = params.get('limit')
+        if limit is not None:
+            try:
+                limit = int(limit)
+            except ValueError:
+                raise ValueError("'limit' must be a non-negative integer")
+        results = funding_query.aggregate(
+            group_by=group_by,
+            projects=params.getlist('project'),
+            funders=params.getlist('funder'),
+            pools=params.getlist('pool'),
+            date_from=params.get('from'),
+            date_to=params.get('to'),
+            sort=params.get('sort'),
+            limit=limit,
+        )
+    except ValueError as e:
+        return {"error": str(e), "status": "error"}, 400
+    except FileNotFoundError as e:
+        return {"error": str(e), "status": "error"}, 503
+    except Exception as e:
+        logging.error(f"Funding aggregate query failed: {str(e)}")
+        return {"error": f"Funding aggregate query failed: {str(e)}", "status": "error"}, 500
 
-        search_description = "all applications" if not project_name else f"applications for project: {project_name}"
-        response = {
-            "message": f"Found {len(results)} {search_description}",
-            "count": len(results),
-            "results": results
-        }
-        return jsonify(response), 200
+    return {"group_by": group_by, "count": len(results), "results": results}, 200
+
+
+@app.route('/funding/aggregate', methods=['GET'])
+def aggregate_funding():
+    """
+    Endpoint for aggregate queries (grants, total amount, distinct projects)
+    over the consolidated funding dataset, grouped by project, funder, pool,
+    year or month and filtered by project, funder, pool and date range.
+    """
+    body, status = funding_aggregate(request.args)
+    return jsonify(body), status
 
-    except Exception as e:
-        error_description = "all applications" if not project_name else f"project: {project_name}"
-        logging.error(f"Search failed for {error_description}: {str(e)}")
-        return jsonify({
-            "error": f"Search failed for {error_description}: {str(e)}",
-            "status": "error"
-        }), 500
 
 # /allo endpoint
 app.register_blueprint(allo_blueprint, url_prefix='/allo')
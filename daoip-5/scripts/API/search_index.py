@@ -0,0 +1,152 @@
+import json
+import logging
+import os
+import threading
+import time
+
+# How often (in seconds) the JSON tree is checked for changes
+REFRESH_INTERVAL = 2.0
+NGRAM_SIZE = 3
+
+
+def ngrams(text, size=NGRAM_SIZE):
+    """
+    Return the set of character n-grams in a string.
+    """
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+class SearchIndex:
+    """
+    In-memory index of every application in the DAOIP-5 JSON tree.
+
+    Applications are loaded once and indexed by the character trigrams of
+    their lowercased projectName and projectId. A search term of three or more
+    characters only has to verify the applications that contain all of its
+    trigrams; shorter terms scan the in-memory records. Results are identical,
+    and in the same order, as a full scan of the files.
+
+    The tree is re-scanned for added, removed or modified files at most every
+    REFRESH_INTERVAL seconds, and the index is rebuilt when anything changed.
+    """
+
+    def __init__(self, base_path, refresh_interval=REFRESH_INTERVAL):
+        self.base_path = base_path
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self._signature = None
+        self._checked_at = 0.0
+        # (results, search_keys, postings) is swapped as a whole on rebuild so
+        # that readers never see a half-built index.
+        self._snapshot = ([], [], {})
+
+    def _application_files(self):
+        """
+        List (grant_system, filename, path) for every applications file.
+        """
+        files = []
+        for system in os.listdir(self.base_path):
+            folder_path = os.path.join(self.base_path, system)
+            if not os.path.isdir(folder_path):
+                continue
+            for filename in os.listdir(folder_path):
+                if filename.endswith('.json') and 'applications' in filename:
+                    files.append((system, filename, os.path.join(folder_path, filename)))
+        return files
+
+    def _compute_signature(self, files):
+        signature = []
+        for system, filename, path in files:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            signature.append((system, filename, stat.st_mtime_ns, stat.st_size))
+        return tuple(signature)
+
+    def _build(self, files):
+        results = []
+        search_keys = []
+        postings = {}
+
+        for system, filename, path in files:
+            try:
+                with open(path, 'r') as f:
+                    data = json.load(f)
+
+                if not isinstance(data, dict) or 'grant_pools' not in data:
+                    continue
+
+                for pool in data['grant_pools']:
+                    if not isinstance(pool, dict) or 'applications' not in pool:
+                        continue
+
+                    for app in pool['applications']:
+                        record_id = len(results)
+                        results.append({
+                            **app,
+                            'metadata': {
+                                'grantSystem': system,
+                                'sourceFile': filename,
+                                'grantPoolId': app.get('grantPoolId', 'unknown'),
+                                'grantPoolName': app.get('grantPoolName', 'unknown')
+                            }
+                        })
+                        keys = (
+                            str(app.get('projectName', '')).lower(),
+                            str(app.get('projectId', '')).lower(),
+                        )
+                        search_keys.append(keys)
+                        for gram in ngrams(keys[0]) | ngrams(keys[1]):
+                            postings.setdefault(gram, []).append(record_id)
+
+            except (json.JSONDecodeError, Exception) as e:
+                # Log the error but continue processing other files
+                logging.error(f"Error processing {filename} in {system}: {str(e)}")
+                continue
+
+        return results, search_keys, postings
+
+    def refresh(self, force=False):
+        """
+        Rebuild the index if the JSON tree changed since the last build.
+        """
+        now = time.monotonic()
+        if not force and now - self._checked_at < self.refresh_interval:
+            return
+
+        with self._lock:
+            if not force and now - self._checked_at < self.refresh_interval:
+                return
+            files = self._application_files()
+            signature = self._compute_signature(files)
+            if force or signature != self._signature:
+                self._snapshot = self._build(files)
+                self._signature = signature
+                logging.info(f"Search index built with {len(self._snapshot[0])} applications")
+            self._checked_at = time.monotonic()
+
+    def search(self, project_name):
+        """
+        Return every application whose projectName or projectId contains
+        project_name (case-insensitive), or all applications if it is empty.
+        """
+        self.refresh()
+        results, search_keys, postings = self._snapshot
+
+        if not project_name:
+            return list(results)
+
+        term = project_name.lower()
+        if len(term) < NGRAM_SIZE:
+            candidates = range(len(results))
+        else:
+            lists = sorted((postings.get(gram, []) for gram in ngrams(term)), key=len)
+            candidates = set(lists[0]).intersection(*lists[1:])
+            candidates = sorted(candidates)
+
+        return [
+            results[record_id]
+            for record_id in candidates
+            if term in search_keys[record_id][0] or term in search_keys[record_id][1]
+        ]
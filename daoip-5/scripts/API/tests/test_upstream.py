@@ -0,0 +1,75 @@
+import asyncio
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from x_to_DAOIP5.upstream import AsyncUpstreamClient, CircuitOpenError
+
+
+class SlowUpstreamClient(AsyncUpstreamClient):
+    """
+    Client whose requests never reach the network and never finish on
+    their own, so that they can be cancelled mid-flight.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__("http://upstream.invalid", **kwargs)
+        self.started = asyncio.Event()
+        self.fail = False
+
+    async def _post_with_retries(self, payload):
+        if self.fail:
+            raise ConnectionError("upstream down")
+        self.started.set()
+        await asyncio.sleep(3600)
+
+
+class CancelledTrialTest(unittest.IsolatedAsyncioTestCase):
+    async def test_cancelled_trial_releases_circuit(self):
+        client = SlowUpstreamClient(failure_threshold=1, reset_timeout=0.01)
+        client.fail = True
+        with self.assertRaises(ConnectionError):
+            await client.post_json({})
+        self.assertEqual(client.breaker.state, "open")
+
+        await asyncio.sleep(0.02)
+        client.fail = False
+        trial = asyncio.create_task(client.post_json({}))
+        await client.started.wait()
+        trial.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await trial
+
+        # The cancelled trial re-opened the circuit instead of blocking it
+        self.assertFalse(client.breaker._trial_in_flight)
+        self.assertEqual(client.breaker.state, "open")
+        await asyncio.sleep(0.02)
+        self.assertEqual(client.breaker.state, "half-open")
+        client.started.clear()
+        trial = asyncio.create_task(client.post_json({}))
+        await client.started.wait()
+        trial.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await trial
+
+    async def test_cancelled_call_is_not_a_failure(self):
+        client = SlowUpstreamClient(failure_threshold=1)
+        call = asyncio.create_task(client.post_json({}))
+        await client.started.wait()
+        call.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await call
+        self.assertEqual(client.breaker.state, "closed")
+
+    async def test_open_circuit_rejects_calls(self):
+        client = SlowUpstreamClient(failure_threshold=1, reset_timeout=60)
+        client.fail = True
+        with self.assertRaises(ConnectionError):
+            await client.post_json({})
+        with self.assertRaises(CircuitOpenError):
+            await client.post_json({})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,11 +1,41 @@
+import asyncio
 import json
-import requests
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify
+from .response_cache import ResponseCache, make_key
+from .upstream import AsyncUpstreamClient, UpstreamClient
 
 allo_blueprint = Blueprint('allo', __name__)
 
-ALLO_API_URL = "https://grants-stack-indexer-v2.gitcoin.co/graphql"
+# Override ALLO_API_URL to point at a different (e.g. local stand-in) indexer
+ALLO_API_URL = os.environ.get("ALLO_API_URL", "https://grants-stack-indexer-v2.gitcoin.co/graphql")
+
+ALLO_CLIENT_OPTIONS = {
+    "connect_timeout": float(os.environ.get("ALLO_CONNECT_TIMEOUT", 3.05)),
+    "read_timeout": float(os.environ.get("ALLO_READ_TIMEOUT", 10)),
+    "retries": int(os.environ.get("ALLO_RETRIES", 2)),
+    "failure_threshold": int(os.environ.get("ALLO_CIRCUIT_FAILURES", 5)),
+    "reset_timeout": float(os.environ.get("ALLO_CIRCUIT_RESET", 30)),
+}
+
+# Shared, pooled clients; every query sent through them is a read and safe to
+# retry. The async client is used by the ASGI app (asgi.py).
+allo_client = UpstreamClient(ALLO_API_URL, **ALLO_CLIENT_OPTIONS)
+async_allo_client = AsyncUpstreamClient(ALLO_API_URL, **ALLO_CLIENT_OPTIONS)
+
+# Responses are cached per query and variables. ALLO_CACHE_TTL=0 disables the cache.
+allo_cache = ResponseCache(
+    ttl=float(os.environ.get("ALLO_CACHE_TTL", 60)),
+    stale_ttl=float(os.environ.get("ALLO_CACHE_STALE_TTL", 300)),
+    max_entries=int(os.environ.get("ALLO_CACHE_MAX_ENTRIES", 256)),
+)
+
+# Page size and number of concurrent page requests for /applications?all=true
+BULK_PAGE_SIZE = int(os.environ.get("ALLO_BULK_PAGE_SIZE", 100))
+BULK_CONCURRENCY = int(os.environ.get("ALLO_BULK_CONCURRENCY", 4))
 
 GRANT_POOLS_QUERY = """
 query GetGrantPools($first: Int, $offset: Int) {
@@ -43,20 +73,199 @@ query Applications($filter: ApplicationFilter, $first: Int, $offset: Int) {
 }
 """
 
+ALLO_DOCS = {
+    "message": "Welcome to the Allo Protocol API",
+    "endpoints": {
+        "/allo/grant_pools.json": {
+            "method": "GET",
+            "description": "List all grant pools with pagination support.",
+            "parameters": {
+                "first": {
+                    "type": "integer",
+                    "required": False,
+                    "default": 10,
+                    "description": "Number of grant pools to fetch."
+                },
+                "offset": {
+                    "type": "integer",
+                    "required": False,
+                    "default": 0,
+                    "description": "Offset for pagination."
+                }
+            },
+            "response": {
+                "type": "object",
+                "properties": {
+                    "@context": {
+                        "type": "string",
+                        "description": "The schema context URL."
+                    },
+                    "name": {
+                        "type": "string",
+                        "description": "The name of the protocol."
+                    },
+                    "type": {
+                        "type": "string",
+                        "description": "Entity type."
+                    },
+                    "grantPools": {
+                        "type": "array",
+                        "description": "An array of grant pool objects."
+                    },
+                    "pagination": {
+                        "type": "object",
+                        "description": "Pagination metadata.",
+                        "properties": {
+                            "first": {
+                                "type": "integer",
+                                "description": "Number of grant pools fetched."
+                            },
+                            "offset": {
+                                "type": "integer",
+                                "description": "Offset used for pagination."
+                            },
+                            "returned": {
+                                "type": "integer",
+                                "description": "Number of grant pools returned in this response."
+                            }
+                        }
+                    }
+                }
+            }
+        },
+        "/allo/applications": {
+            "method": "GET",
+            "description": "List all applications for a specific grant pool.",
+            "parameters": {
+                "roundId": {
+                    "type": "string",
+                    "required": True,
+                    "description": "The ID of the grant pool to fetch applications for."
+                },
+                "first": {
+                    "type": "integer",
+                    "required": False,
+                    "default": 10,
+                    "description": "Number of applications to fetch."
+                },
+                "offset": {
+                    "type": "integer",
+                    "required": False,
+                    "default": 0,
+                    "description": "Offset for pagination."
+                },
+                "all": {
+                    "type": "boolean",
+                    "required": False,
+                    "default": False,
+                    "description": "Fetch every application in the round, requesting pages of `first` (default 100) concurrently, and stream back one merged document. `offset` is ignored."
+                }
+            },
+            "response": {
+                "type": "object",
+                "properties": {
+                    "@context": {
+                        "type": "string",
+                        "description": "The schema context URL."
+                    },
+                    "name": {
+                        "type": "string",
+                        "description": "The name of the protocol."
+                    },
+                    "type": {
+                        "type": "string",
+                        "description": "Entity type."
+                    },
+                    "grantPools": {
+                        "type": "array",
+                        "description": "An array of grant pool objects containing applications."
+                    },
+                    "pagination": {
+                        "type": "object",
+                        "description": "Pagination metadata.",
+                        "properties": {
+                            "first": {
+                                "type": "integer",
+                                "description": "Number of applications fetched."
+                            },
+                            "offset": {
+                                "type": "integer",
+                                "description": "Offset used for pagination."
+                            },
+                            "returned": {
+                                "type": "integer",
+                                "description": "Number of applications returned in this response."
+                            }
+                        }
+                    }
+                }
+            }
+        },
+        "/allo/metrics": {
+            "method": "GET",
+            "description": "Upstream request counts, latency percentiles, circuit breaker state and cache statistics.",
+            "parameters": {}
+        }
+    }
+}
+
+def unwrap_graphql(data):
+    """
+    Return the data of a GraphQL response, raising if it has none.
+    """
+    if data.get("data") is None:
+        raise ValueError(f"No data in response: {data.get('errors')}")
+    return data["data"]
+
+def post_allo_query(query, variables):
+    """
+    Send a query to the Allo Protocol's GraphQL API, raising on failure.
+    """
+    return unwrap_graphql(allo_client.post_json({"query": query, "variables": variables}))
+
+async def apost_allo_query(query, variables):
+    """
+    Async variant of post_allo_query.
+    """
+    return unwrap_graphql(await async_allo_client.post_json({"query": query, "variables": variables}))
+
+def query_allo(query, variables):
+    """
+    Fetch data from the Allo Protocol's GraphQL API, raising on failure.
+
+    Responses are served from allo_cache when fresh, or stale while a
+    background refresh runs. Failed requests are not cached.
+    """
+    return allo_cache.get_or_fetch(
+        make_key(query, variables), lambda: post_allo_query(query, variables)
+    )
+
+async def aquery_allo(query, variables):
+    """
+    Async variant of query_allo, sharing the same response cache.
+    """
+    return await allo_cache.aget_or_fetch(
+        make_key(query, variables), lambda: apost_allo_query(query, variables)
+    )
+
 def fetch_allo_data(query, variables):
     """
-    Fetch data from the Allo Protocol's GraphQL API.
+    Fetch data from the Allo Protocol's GraphQL API, or {} on failure.
     """
-    headers = {"Content-Type": "application/json"}
-    response = requests.post(ALLO_API_URL, json={"query": query, "variables": variables}, headers=headers)
+    try:
+        return query_allo(query, variables)
+    except Exception as e:
+        print(f"Error fetching data: {e}")
+        return {}
 
+async def afetch_allo_data(query, variables):
+    """
+    Async variant of fetch_allo_data.
+    """
     try:
-        response.raise_for_status()
-        data = response.json()
-        return data.get("data", {})
+        return await aquery_allo(query, variables)
     except Exception as e:
         print(f"Error fetching data: {e}")
-        print("Response content:", response.content.decode())
         return {}
 
 def map_grant_pool(pool_data):
@@ -122,16 +331,158 @@ def map_application(application, grant_pool_id):
         "payouts": []
     }
 
+def get_grant_pool_name(applications, round_id):
+    """
+    Take the grant pool name from the round metadata of the first application.
+    """
+    for app in applications:
+        if "round" in app and "roundMetadata" in app["round"]:
+            return app["round"]["roundMetadata"].get("name", f"Grant Pool for {round_id}")
+    return "Unknown Grant Pool"
+
+def applications_filter(round_id, chain_id=None):
+    application_filter = {"roundId": {"equalTo": round_id}}
+    if chain_id is not None:
+        application_filter["chainId"] = {"equalTo": chain_id}
+    return application_filter
+
+def iter_application_pages(round_id, page_size, concurrency, chain_id=None):
+    """
+    Yield every page of applications in a round, in order.
+
+    Up to `concurrency` pages are requested at once. Fetching stops at the
+    first page holding fewer than `page_size` applications. Raises if a page
+    cannot be fetched. Pass chain_id to disambiguate round IDs that exist on
+    several chains.
+    """
+    application_filter = applications_filter(round_id, chain_id)
+
+    def fetch_page(offset):
+        variables = {"filter": application_filter, "first": page_size, "offset": offset}
+        return query_allo(APPLICATIONS_QUERY, variables).get("applications", [])
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        in_flight = deque()
+        next_offset = 0
+        try:
+            while True:
+                while len(in_flight) < concurrency:
+                    in_flight.append(executor.submit(fetch_page, next_offset))
+                    next_offset += page_size
+                page = in_flight.popleft().result()
+                yield page
+                if len(page) < page_size:
+                    return
+        finally:
+            for future in in_flight:
+                future.cancel()
+
+async def aiter_application_pages(round_id, page_size, concurrency, chain_id=None):
+    """
+    Async variant of iter_application_pages, fetching pages as concurrent
+    tasks on the running event loop.
+    """
+    application_filter = applications_filter(round_id, chain_id)
+
+    async def fetch_page(offset):
+        variables = {"filter": application_filter, "first": page_size, "offset": offset}
+        return (await aquery_allo(APPLICATIONS_QUERY, variables)).get("applications", [])
+
+    in_flight = deque()
+    next_offset = 0
+    try:
+        while True:
+            while len(in_flight) < concurrency:
+                in_flight.append(asyncio.ensure_future(fetch_page(next_offset)))
+                next_offset += page_size
+            page = await in_flight.popleft()
+            yield page
+            if len(page) < page_size:
+                return
+    finally:
+        for task in in_flight:
+            task.cancel()
+
+def bulk_document_head(round_id, first_page):
+    """
+    Opening of the streamed /applications?all=true document, up to the
+    applications array.
+    """
+    envelope = {
+        "@context": "http://www.daostar.org/schemas",
+        "name": "Allo Protocol Applications",
+        "type": "Entity",
+    }
+    pool = {
+        "type": "GrantPool",
+        "id": round_id,
+        "name": get_grant_pool_name(first_page, round_id),
+    }
+    return json.dumps(envelope)[:-1] + ', "grantPools": [' + json.dumps(pool)[:-1] + ', "applications": ['
+
+def bulk_document_item(app, round_id, index):
+    return ("," if index else "") + json.dumps(map_application(app, round_id))
+
+def bulk_document_tail(page_size, returned, error=None):
+    tail = {"pagination": {"first": page_size, "offset": 0, "returned": returned}}
+    if error:
+        tail["error"] = error
+    return "]}], " + json.dumps(tail)[1:]
+
+def stream_all_applications(round_id, page_size, concurrency):
+    """
+    Stream the DAOIP-5 document for every application in a round.
+
+    Applications are mapped and written as their pages arrive. If a page fails
+    after the response has started, the document is closed early and carries
+    an "error" field.
+    """
+    pages = iter_application_pages(round_id, page_size, concurrency)
+    try:
+        first_page = next(pages)
+    except Exception as e:
+        return jsonify({"error": f"Error fetching applications: {e}"}), 502
+
+    def generate():
+        yield bulk_document_head(round_id, first_page)
+
+        returned = 0
+        error = None
+        page = first_page
+        try:
+            while True:
+                for app in page:
+                    yield bulk_document_item(app, round_id, returned)
+                    returned += 1
+                page = next(pages, None)
+                if page is None:
+                    break
+        except Exception as e:
+            print(f"Error fetching applications: {e}")
+            error = f"Error fetching applications: {e}"
+        finally:
+            pages.close()
+
+        yield bulk_document_tail(page_size, returned, error)
+
+    return Response(generate(), mimetype="application/json")
+
 @allo_blueprint.route('/grant_pools.json', methods=['GET'])
 def list_grant_pools():
     first = int(request.args.get("first", 10))
     offset = int(request.args.get("offset", 0))
 
     api_data = fetch_allo_data(GRANT_POOLS_QUERY, {"first": first, "offset": offset})
+    return jsonify(grant_pools_response(api_data, first, offset)), 200
+
+def grant_pools_response(api_data, first, offset):
+    """
+    Build the /grant_pools.json document from a GetGrantPools query result.
+    """
     pools = api_data.get("rounds", [])
     grant_pools = [map_grant_pool(pool) for pool in pools]
 
-    response = {
+    return {
         "@context": "http://www.daostar.org/schemas",
         "name": "Allo Protocol",
         "type": "Entity",
@@ -142,7 +493,6 @@ def list_grant_pools():
             "returned": len(grant_pools),
         }
     }
-    return jsonify(response), 200
 
 @allo_blueprint.route('/applications', methods=['GET'])
 def list_applications():
@@ -153,21 +503,29 @@ def list_applications():
     if not round_id:
         return jsonify({"error": "Missing 'roundId' parameter"}), 400
 
-    variables = {"filter": {"roundId": {"equalTo": round_id}}, "first": first, "offset": offset}
+    if request.args.get("all", "").lower() == "true":
+        page_size = int(request.args.get("first", BULK_PAGE_SIZE))
+        if page_size <= 0:
+            return jsonify({"error": "'first' must be positive"}), 400
+        return stream_all_applications(round_id, page_size, BULK_CONCURRENCY)
+
+    variables = {"filter": applications_filter(round_id), "first": first, "offset": offset}
     api_data = fetch_allo_data(APPLICATIONS_QUERY, variables)
+    return jsonify(applications_response(api_data, round_id, first, offset)), 200
+
+def applications_response(api_data, round_id, first, offset):
+    """
+    Build the /applications document for one page of an Applications query.
+    """
     applications = api_data.get("applications", [])
 
-    grant_pool_name = "Unknown Grant Pool"
-    for app in applications:
-        if "round" in app and "roundMetadata" in app["round"]:
-            grant_pool_name = app["round"]["roundMetadata"].get("name", f"Grant Pool for {round_id}")
-            break
+    grant_pool_name = get_grant_pool_name(applications, round_id)
 
     mapped_applications = [
         map_application(app, round_id) for app in applications
     ]
 
-    response = {
+    return {
         "@context": "http://www.daostar.org/schemas",
         "name": "Allo Protocol Applications",
         "type": "Entity",
@@ -185,135 +543,17 @@ def list_applications():
             "returned": len(mapped_applications),
         }
     }
-    return jsonify(response), 200
+
+@allo_blueprint.route('/metrics', methods=['GET'])
+def upstream_metrics():
+    """
+    Report upstream request, latency, circuit breaker and cache statistics.
+    """
+    return jsonify({"upstream": allo_client.stats(), "cache": allo_cache.stats()}), 200
 
 @allo_blueprint.route('/', methods=['GET'])
 def allo_docs():
     """
     Serve JSON documentation for the Allo endpoints.
     """
-    docs = {
-        "message": "Welcome to the Allo Protocol API",
-        "endpoints": {
-            "/allo/grant_pools.json": {
-                "method": "GET",
-                "description": "List all grant pools with pagination support.",
-                "parameters": {
-                    "first": {
-                        "type": "integer",
-                        "required": False,
-                        "default": 10,
-                        "description": "Number of grant pools to fetch."
-                    },
-                    "offset": {
-                        "type": "integer",
-                        "required": False,
-                        "default": 0,
-                        "description": "Offset for pagination."
-                    }
-                },
-                "response": {
-                    "type": "object",
-                    "properties": {
-                        "@context": {
-                            "type": "string",
-                            "description": "The schema context URL."
-                        },
-                        "name": {
-                            "type": "string",
-                            "description": "The name of the protocol."
-                        },
-                        "type": {
-                            "type": "string",
-                            "description": "Entity type."
-                        },
-                        "grantPools": {
-                            "type": "array",
-                            "description": "An array of grant pool objects."
-                        },
-                        "pagination": {
-                            "type": "object",
-                            "description": "Pagination metadata.",
-                            "properties": {
-                                "first": {
-                                    "type": "integer",
-                                    "description": "Number of grant pools fetched."
-                                },
-                                "offset": {
-                                    "type": "integer",
-                                    "description": "Offset used for pagination."
-                                },
-                                "returned": {
-                                    "type": "integer",
-                                    "description": "Number of grant pools returned in this response."
-                                }
-                            }
-                        }
-                    }
-                }
-            },
-            "/allo/applications": {
-                "method": "GET",
-                "description": "List all applications for a specific grant pool.",
-                "parameters": {
-                    "roundId": {
-                        "type": "string",
-                        "required": True,
-                        "description": "The ID of the grant pool to fetch applications for."
-                    },
-                    "first": {
-                        "type": "integer",
-                        "required": False,
-                        "default": 10,
-                        "description": "Number of applications to fetch."
-                    },
-                    "offset": {
-                        "type": "integer",
-                        "required": False,
-                        "default": 0,
-                        "description": "Offset for pagination."
-                    }
-                },
-                "response": {
-                    "type": "object",
-                    "properties": {
-                        "@context": {
-                            "type": "string",
-                            "description": "The schema context URL."
-                        },
-                        "name": {
-                            "type": "string",
-                            "description": "The name of the protocol."
-                        },
-                        "type": {
-                            "type": "string",
-                            "description": "Entity type."
-                        },
-                        "grantPools": {
-                            "type": "array",
-                            "description": "An array of grant pool objects containing applications."
-                        },
-                        "pagination": {
-                            "type": "object",
-                            "description": "Pagination metadata.",
-                            "properties": {
-                                "first": {
-                                    "type": "integer",
-                                    "description": "Number of applications fetched."
-                                },
-                                "offset": {
-                                    "type": "integer",
-                                    "description": "Offset used for pagination."
-                                },
-                                "returned": {
-                                    "type": "integer",
-                                    "description": "Number of applications returned in this response."
-                                }
-                            }
-                        }
-                    }
-                }
-            }
-        }
-    }
-    return jsonify(docs), 200
+    return jsonify(ALLO_DOCS), 200
@@ -0,0 +1,146 @@
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+
+def make_key(query, variables):
+    """
+    Build a cache key from a GraphQL query and its variables.
+    """
+    return json.dumps({"query": query, "variables": variables}, sort_keys=True)
+
+
+class ResponseCache:
+    """
+    Bounded LRU cache with a TTL and stale-while-revalidate.
+
+    An entry younger than `ttl` seconds is served as-is. Once it expires it is
+    still served for another `stale_ttl` seconds while a background thread
+    fetches a fresh value; after that the caller fetches synchronously. At
+    most `max_entries` entries are kept, evicting the least recently used.
+
+    A fetch function signals failure by raising; failures are never cached,
+    and a failed background refresh leaves the stale value in place.
+    """
+
+    def __init__(self, ttl=60, stale_ttl=300, max_entries=256):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._refreshing = set()
+        # The event loop only keeps weak references to tasks
+        self._refresh_tasks = set()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self):
+        return self.ttl > 0 and self.max_entries > 0
+
+    def _store(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _refresh(self, key, fetch):
+        try:
+            self._store(key, fetch())
+        except Exception as e:
+            logging.warning(f"Background refresh failed, keeping stale value: {e}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def get_or_fetch(self, key, fetch):
+        """
+        Return the cached value for key, calling fetch() when it is missing or
+        too old.
+        """
+        if not self.enabled:
+            return fetch()
+
+        cached = self._lookup(key)
+        if cached is not None:
+            value, needs_refresh = cached
+            if needs_refresh:
+                threading.Thread(target=self._refresh, args=(key, fetch), daemon=True).start()
+            return value
+
+        value = fetch()
+        self._store(key, value)
+        return value
+
+    def _lookup(self, key):
+        """
+        Return (value, needs_refresh) for a usable entry, or None on a miss.
+        A stale entry is only flagged for refresh once until it is replaced.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if now < expires_at:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value, False
+                if now < expires_at + self.stale_ttl:
+                    self._entries.move_to_end(key)
+                    self.stale_hits += 1
+                    needs_refresh = key not in self._refreshing
+                    self._refreshing.add(key)
+                    return value, needs_refresh
+                del self._entries[key]
+            self.misses += 1
+        return None
+
+    async def _arefresh(self, key, fetch):
+        try:
+            self._store(key, await fetch())
+        except Exception as e:
+            logging.warning(f"Background refresh failed, keeping stale value: {e}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    async def aget_or_fetch(self, key, fetch):
+        """
+        Async variant of get_or_fetch, where fetch() returns an awaitable.
+        Stale entries are refreshed in a background task on the running loop.
+        """
+        if not self.enabled:
+            return await fetch()
+
+        cached = self._lookup(key)
+        if cached is not None:
+            value, needs_refresh = cached
+            if needs_refresh:
+                task = asyncio.get_running_loop().create_task(self._arefresh(key, fetch))
+                self._refresh_tasks.add(task)
+                task.add_done_callback(self._refresh_tasks.discard)
+            return value
+
+        value = await fetch()
+        self._store(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "staleHits": self.stale_hits,
+                "misses": self.misses,
+            }
@@ -0,0 +1,251 @@
+import asyncio
+import threading
+import time
+from collections import deque
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class CircuitOpenError(Exception):
+    """
+    Raised instead of calling the upstream while the circuit breaker is open.
+    """
+
+
+class CircuitBreaker:
+    """
+    Fail fast after repeated upstream failures.
+
+    After `failure_threshold` consecutive failures the circuit opens and
+    calls are rejected for `reset_timeout` seconds. The first call after that
+    is let through as a trial: success closes the circuit, failure re-opens it.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if time.monotonic() - self._opened_at < self.reset_timeout:
+                return "open"
+            return "half-open"
+
+    def before_call(self):
+        """
+        Returns True if the call is the half-open trial, whose outcome must
+        be recorded for later calls to be let through.
+        """
+        with self._lock:
+            if self._opened_at is None:
+                return False
+            if time.monotonic() - self._opened_at < self.reset_timeout or self._trial_in_flight:
+                raise CircuitOpenError("Upstream circuit is open; failing fast")
+            self._trial_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+
+
+class UpstreamMetrics:
+    """
+    Request, error and latency counters for an upstream service.
+    """
+
+    def __init__(self, window=1000):
+        self._latencies = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self.rejected = 0
+
+    def observe(self, latency, error=False):
+        with self._lock:
+            self.requests += 1
+            self.errors += int(error)
+            self._latencies.append(latency)
+
+    def reject(self):
+        with self._lock:
+            self.rejected += 1
+
+    def snapshot(self):
+        with self._lock:
+            latencies = sorted(self._latencies)
+            requests_count, errors, rejected = self.requests, self.errors, self.rejected
+
+        def percentile(p):
+            if not latencies:
+                return None
+            return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000, 1)
+
+        return {
+            "requests": requests_count,
+            "errors": errors,
+            "rejected": rejected,
+            "latencyMs": {"p50": percentile(0.5), "p95": percentile(0.95), "p99": percentile(0.99)},
+        }
+
+
+class UpstreamClient:
+    """
+    Pooled HTTP client for a JSON API with timeouts, retries and a circuit
+    breaker.
+
+    Requests share one keep-alive connection pool. Connection errors, read
+    timeouts and 429/5xx responses are retried with exponential backoff; the
+    requests sent through this client must therefore be idempotent.
+    """
+
+    def __init__(self, url, connect_timeout=3.05, read_timeout=10, retries=2,
+                 backoff_factor=0.5, pool_size=10, failure_threshold=5, reset_timeout=30):
+        self.url = url
+        self.timeout = (connect_timeout, read_timeout)
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.metrics = UpstreamMetrics()
+
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=frozenset({"POST"}),
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def post_json(self, payload):
+        """
+        POST a JSON payload and return the decoded JSON response.
+
+        Raises:
+            CircuitOpenError: If the circuit breaker is open
+            requests.RequestException: If the request failed after retries
+        """
+        try:
+            self.breaker.before_call()
+        except CircuitOpenError:
+            self.metrics.reject()
+            raise
+
+        start = time.monotonic()
+        try:
+            response = self.session.post(self.url, json=payload, timeout=self.timeout)
+            response.raise_for_status()
+            data = response.json()
+        except Exception:
+            self.metrics.observe(time.monotonic() - start, error=True)
+            self.breaker.record_failure()
+            raise
+
+        self.metrics.observe(time.monotonic() - start)
+        self.breaker.record_success()
+        return data
+
+    def stats(self):
+        return {**self.metrics.snapshot(), "circuit": self.breaker.state}
+
+
+class AsyncUpstreamClient:
+    """
+    Non-blocking counterpart of UpstreamClient for use on an event loop.
+
+    Shares the same timeout, retry and circuit breaker semantics, using a
+    pooled httpx.AsyncClient. The client is created on first use so that it
+    binds to the running event loop.
+    """
+
+    def __init__(self, url, connect_timeout=3.05, read_timeout=10, retries=2,
+                 backoff_factor=0.5, pool_size=10, failure_threshold=5, reset_timeout=30):
+        self.url = url
+        self.timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        self.limits = httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.metrics = UpstreamMetrics()
+        self._client = None
+
+    def _get_client(self):
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=self.timeout, limits=self.limits)
+        return self._client
+
+    async def _post_with_retries(self, payload):
+        client = self._get_client()
+        for attempt in range(self.retries + 1):
+            try:
+                response = await client.post(self.url, json=payload)
+                if response.status_code not in RETRY_STATUSES or attempt == self.retries:
+                    response.raise_for_status()
+                    return response.json()
+            except httpx.TransportError:
+                if attempt == self.retries:
+                    raise
+            await asyncio.sleep(self.backoff_factor * (2 ** attempt))
+
+    async def post_json(self, payload):
+        """
+        POST a JSON payload and return the decoded JSON response.
+
+        Raises:
+            CircuitOpenError: If the circuit breaker is open
+            httpx.HTTPError: If the request failed after retries
+        """
+        try:
+            trial = self.breaker.before_call()
+        except CircuitOpenError:
+            self.metrics.reject()
+            raise
+
+        start = time.monotonic()
+        try:
+            data = await self._post_with_retries(payload)
+        except Exception:
+            self.metrics.observe(time.monotonic() - start, error=True)
+            self.breaker.record_failure()
+            raise
+        except asyncio.CancelledError:
+            # Cancellation (e.g. a client disconnect or an abandoned prefetch)
+            # says nothing about the upstream, but a cancelled trial must
+            # still be released; it re-opens the circuit like a failed one.
+            if trial:
+                self.breaker.record_failure()
+            raise
+
+        self.metrics.observe(time.monotonic() - start)
+        self.breaker.record_success()
+        return data
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def stats(self):
+        return {**self.metrics.snapshot(), "circuit": self.breaker.state}
@@ -1,9 +1,30 @@
 import csv
+import hashlib
 import json
 import math
 import yaml
 import argparse
+import io
 import os
+import sys
+import tempfile
+from array import array
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+# Precompressed siblings are written by the same code as the funding_data build's
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'src')))
+from compress import write_compressed
+
+BASE_JSON_FOLDER = os.path.abspath(os.path.join(os.path.dirname(__file__), '../json'))
+FUNDERS_FOLDER = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../data/funders'))
+# Records a fingerprint of the inputs of every generated file, for --all
+STATE_FILE = '.generate-state'
+# Precompressed siblings that may sit next to a generated file
+COMPRESSED_SUFFIXES = ('.gz', '.br')
+# Bump when the generated JSON changes for unchanged inputs, to regenerate everything
+GENERATOR_VERSION = 1
+# Indentation of an application object inside grant_pools[].applications[]
+APPLICATION_INDENT = ' ' * 16
 
 
 def nan_to_null(value):
@@ -23,7 +44,11 @@ def validate_metadata(metadata):
         if key not in metadata:
             print(f"Warning: Missing key '{key}' in metadata. Using default values.")
 
-def process_row(row, application_id):
+def process_row(row, application_id, metadata=None):
+    """
+    Map a CSV row to a GrantApplication. Pass metadata when the row's metadata
+    column has already been decoded.
+    """
     project_name = row['to_project_name']
     # Use a default value (e.g., 0) if 'amount' is missing or invalid
     try:
@@ -31,7 +56,8 @@ def process_row(row, application_id):
     except ValueError:
         amount = 0  # Default value for invalid or missing 'amount'    
     funding_date = row['funding_date']
-    metadata = json.loads(row['metadata'])
+    if metadata is None:
+        metadata = json.loads(row['metadata'])
     validate_metadata(metadata)
 
     application = {
@@ -61,36 +87,70 @@ def process_row(row, application_id):
     return application
 
 
-def generate_application_uri(csv_file, dao_name, dao_type):
-    base_structure = {
-        "@context": "http://www.daostar.org/schemas",
-        "name": dao_name.capitalize(),  
-        "type": dao_type.capitalize(), 
-        "grant_pools": []
-    }
-
+def write_application_uri(csv_file, dao_name, dao_type, outfile):
+    """
+    Stream the applications URI document for a CSV into outfile.
+    """
     with open(csv_file, newline='', encoding='utf-8-sig') as csvfile:
         reader = csv.DictReader(csvfile)
-        application_id = 1  
+        write_applications(((row, None) for row in reader), dao_name, dao_type, outfile)
 
-        grant_pools_dict = {}
 
-        for row in reader:
+def write_applications(rows, dao_name, dao_type, outfile):
+    """
+    Stream an applications URI document for (row, metadata) pairs into
+    outfile, where metadata is the decoded metadata column or None.
+
+    Each application is serialized as soon as its row is read and spooled to
+    a temporary file, keeping only its position per grant pool, so memory use
+    stays flat however many rows the CSV has. The output is identical to
+    json.dumps(document, indent=4).
+    """
+    pool_names = []
+    pool_offsets = {}
+
+    with tempfile.TemporaryFile() as spool:
+        for application_id, (row, metadata) in enumerate(rows, start=1):
             grant_pool_name = row['grant_pool_name']
-            if grant_pool_name not in grant_pools_dict:
-                grant_pools_dict[grant_pool_name] = {
-                    "type": "GrantPool",
-                    "name": grant_pool_name,
-                    "applications": []
-                }
-            
-            application = process_row(row, application_id)
-            grant_pools_dict[grant_pool_name]['applications'].append(application)
-            application_id += 1
+            if grant_pool_name not in pool_offsets:
+                pool_names.append(grant_pool_name)
+                pool_offsets[grant_pool_name] = (array('q'), array('q'))
+
+            application = json.dumps(process_row(row, application_id, metadata), indent=4, default=nan_to_null)
+            encoded = (APPLICATION_INDENT + application.replace('\n', '\n' + APPLICATION_INDENT)).encode('utf-8')
+            offsets, lengths = pool_offsets[grant_pool_name]
+            offsets.append(spool.tell())
+            lengths.append(len(encoded))
+            spool.write(encoded)
+
+        outfile.write('{\n')
+        outfile.write(f'    "@context": {json.dumps("http://www.daostar.org/schemas")},\n')
+        outfile.write(f'    "name": {json.dumps(dao_name.capitalize())},\n')
+        outfile.write(f'    "type": {json.dumps(dao_type.capitalize())},\n')
+        if not pool_names:
+            outfile.write('    "grant_pools": []\n}')
+            return
+        outfile.write('    "grant_pools": [\n')
+
+        for pool_index, grant_pool_name in enumerate(pool_names):
+            outfile.write(',\n' if pool_index else '')
+            outfile.write('        {\n')
+            outfile.write('            "type": "GrantPool",\n')
+            outfile.write(f'            "name": {json.dumps(grant_pool_name)},\n')
+            outfile.write('            "applications": [\n')
+            offsets, lengths = pool_offsets[grant_pool_name]
+            for index, (offset, length) in enumerate(zip(offsets, lengths)):
+                spool.seek(offset)
+                outfile.write(',\n' if index else '')
+                outfile.write(spool.read(length).decode('utf-8'))
+            outfile.write('\n            ]\n        }')
+        outfile.write('\n    ]\n}')
 
-        base_structure['grant_pools'] = list(grant_pools_dict.values())
 
-    return json.dumps(base_structure, indent=4, default=nan_to_null)
+def generate_application_uri(csv_file, dao_name, dao_type):
+    output = io.StringIO()
+    write_application_uri(csv_file, dao_name, dao_type, output)
+    return output.getvalue()
 
 def generate_grant_pool_json(yaml_file, dao_name, dao_type):
     dao_metadata = load_dao_metadata(yaml_file)
@@ -128,7 +188,13 @@ def get_csv_filename_without_extension(csv_file_path):
 def parse_arguments():
     parser = argparse.ArgumentParser(description='Generate Applications URI and/or Grants Pool JSON')
     
-    parser.add_argument('--path', type=str, required=True, help='Root path of the folder to crawl')
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--path', type=str, help='Root path of the folder to crawl')
+    source.add_argument('--all', type=str, nargs='?', const=FUNDERS_FOLDER, metavar='FUNDERS_PATH',
+                        help='Regenerate the files of every funder under FUNDERS_PATH (default: data/funders) whose CSVs or YAML changed')
+    parser.add_argument('--workers', type=int, default=0, help='Processes used with --all (0 = one per CPU, default: 0)')
+    parser.add_argument('--force', action='store_true', help='With --all, regenerate every file, ignoring the saved state')
+    parser.add_argument('--compress', action='store_true', help='Also write .gz (and, with brotli installed, .br) copies of each JSON file')
     
     return parser.parse_args()
 
@@ -157,10 +223,23 @@ def create_folder_based_on_path(base_path, input_path):
     unique_folder_path = os.path.join(base_path, folder_name)
     return ensure_folder(unique_folder_path)
 
-if __name__ == "__main__":
-    args = parse_arguments()
-    root_path = args.path
-    
+def write_output(file_name, content, compress=False):
+    with open(file_name, 'w') as outfile:
+        outfile.write(content)
+    if compress:
+        write_compressed(file_name)
+
+def generate_applications_file(csv_file, dao_name, dao_type, applications_file_name, compress=False):
+    with open(applications_file_name, 'w') as outfile:
+        write_application_uri(csv_file, dao_name, dao_type, outfile)
+    if compress:
+        write_compressed(applications_file_name)
+    return applications_file_name
+
+def generate_folder(root_path, compress=False):
+    """
+    Generate the applications and grants pool files for one funder folder.
+    """
     yaml_file, csv_files = find_files(root_path)
 
     dao_metadata = load_dao_metadata(yaml_file)
@@ -168,20 +247,150 @@ if __name__ == "__main__":
     dao_type = dao_metadata.get('type', 'DAO')  # Default to "DAO" if not found
 
     # Use relative path based on the project's structure
-    base_json_folder = os.path.abspath(os.path.join(os.path.dirname(__file__), '../json'))
-    json_folder = create_folder_based_on_path(base_json_folder, root_path)
+    json_folder = create_folder_based_on_path(BASE_JSON_FOLDER, root_path)
 
     for csv_file in csv_files:
         csv_filename = get_csv_filename_without_extension(csv_file)
-
-        applications_uri_json = generate_application_uri(csv_file, dao_name, dao_type)
         applications_file_name = os.path.join(json_folder, f"{csv_filename}_applications_uri.json")
-        with open(applications_file_name, 'w') as outfile:
-            outfile.write(applications_uri_json)
+        generate_applications_file(csv_file, dao_name, dao_type, applications_file_name, compress)
         print(f"Applications URI JSON has been generated and saved to {applications_file_name}")
 
     grants_pool_file_name = os.path.join(json_folder, 'grants_pool.json')
-    grant_pool_json = generate_grant_pool_json(yaml_file, dao_name, dao_type)
-    with open(grants_pool_file_name, 'w') as outfile:
-        outfile.write(grant_pool_json)
+    write_output(grants_pool_file_name, generate_grant_pool_json(yaml_file, dao_name, dao_type), compress)
     print(f"Grants Pool JSON has been generated and saved to {grants_pool_file_name}")
+
+def file_hash(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def fingerprint(*hashes):
+    return hashlib.sha256(':'.join((str(GENERATOR_VERSION),) + hashes).encode()).hexdigest()
+
+def load_state(path):
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+def plan_all(funders_path, state, compress=False):
+    """
+    List the files to regenerate for every funder under funders_path.
+
+    A file is regenerated when the hash of its inputs (its CSV and the
+    funder's YAML, or just the YAML for grants_pool.json) differs from the one
+    recorded in state, or when the file is missing.
+
+    Returns:
+        (jobs, grant_pool_jobs, fingerprints), where jobs are arguments for
+        generate_applications_file, grant_pool_jobs are
+        (yaml_file, dao_name, dao_type, file_name) and fingerprints maps each
+        output, relative to BASE_JSON_FOLDER, to its new fingerprint.
+    """
+    jobs = []
+    grant_pool_jobs = []
+    fingerprints = {}
+
+    def is_stale(file_name, new_fingerprint):
+        key = os.path.relpath(file_name, BASE_JSON_FOLDER)
+        fingerprints[key] = new_fingerprint
+        outputs = [file_name] + ([f"{file_name}.gz"] if compress else [])
+        return state.get(key) != new_fingerprint or not all(os.path.exists(output) for output in outputs)
+
+    for funder in sorted(os.listdir(funders_path)):
+        root_path = os.path.join(funders_path, funder)
+        if not os.path.isdir(root_path):
+            continue
+        try:
+            yaml_file, csv_files = find_files(root_path)
+        except FileNotFoundError as e:
+            print(f"Skipping {funder}: {e}")
+            continue
+
+        dao_metadata = load_dao_metadata(yaml_file)
+        dao_name = dao_metadata.get('name', 'Unknown Project')
+        dao_type = dao_metadata.get('type', 'DAO')
+        json_folder = create_folder_based_on_path(BASE_JSON_FOLDER, root_path)
+        yaml_hash = file_hash(yaml_file)
+
+        for csv_file in csv_files:
+            applications_file_name = os.path.join(json_folder, f"{get_csv_filename_without_extension(csv_file)}_applications_uri.json")
+            if is_stale(applications_file_name, fingerprint(yaml_hash, file_hash(csv_file))):
+                jobs.append((csv_file, dao_name, dao_type, applications_file_name, compress))
+
+        grants_pool_file_name = os.path.join(json_folder, 'grants_pool.json')
+        if is_stale(grants_pool_file_name, fingerprint(yaml_hash)):
+            grant_pool_jobs.append((yaml_file, dao_name, dao_type, grants_pool_file_name))
+
+    return jobs, grant_pool_jobs, fingerprints
+
+def save_state(state_path, previous_state, fingerprints, done):
+    """
+    Record the fingerprints of the files that are up to date: those generated
+    in this run (done) and those that were already current. Failed files are
+    left out so the next run retries them.
+    """
+    state = {
+        key: value for key, value in fingerprints.items()
+        if key in done or previous_state.get(key) == value
+    }
+    with open(state_path, 'w') as f:
+        json.dump(state, f, indent=4, sort_keys=True)
+
+def remove_orphans(previous_state, fingerprints):
+    """
+    Delete the outputs recorded in the previous state that no source maps to
+    any more (their CSV or funder folder was removed), together with their
+    precompressed siblings. Only files this script generated are touched.
+
+    Returns:
+        The removed outputs, relative to BASE_JSON_FOLDER
+    """
+    removed = sorted(set(previous_state) - set(fingerprints))
+    for key in removed:
+        path = os.path.join(BASE_JSON_FOLDER, key)
+        for output in [path] + [path + suffix for suffix in COMPRESSED_SUFFIXES]:
+            if os.path.exists(output):
+                os.remove(output)
+    return removed
+
+def generate_all(funders_path, workers=0, force=False, compress=False):
+    """
+    Regenerate the outputs of every funder whose inputs changed since the last
+    run, generating applications files across a process pool.
+    """
+    state_path = os.path.join(BASE_JSON_FOLDER, STATE_FILE)
+    previous_state = load_state(state_path)
+    jobs, grant_pool_jobs, fingerprints = plan_all(funders_path, {} if force else previous_state, compress)
+    print(f"Regenerating {len(jobs)} applications file(s) and {len(grant_pool_jobs)} grants pool file(s)")
+
+    done = set()
+    with ProcessPoolExecutor(max_workers=workers or None) as executor:
+        futures = {executor.submit(generate_applications_file, *job): job for job in jobs}
+        for future in as_completed(futures):
+            csv_file = futures[future][0]
+            try:
+                file_name = future.result()
+            except Exception as e:
+                print(f"Failed to generate applications for {csv_file}: {e}")
+                continue
+            done.add(os.path.relpath(file_name, BASE_JSON_FOLDER))
+            print(f"Applications URI JSON has been generated and saved to {file_name}")
+
+    for yaml_file, dao_name, dao_type, file_name in grant_pool_jobs:
+        write_output(file_name, generate_grant_pool_json(yaml_file, dao_name, dao_type), compress)
+        done.add(os.path.relpath(file_name, BASE_JSON_FOLDER))
+        print(f"Grants Pool JSON has been generated and saved to {file_name}")
+
+    for key in remove_orphans(previous_state, fingerprints):
+        print(f"Removed {key}: no source generates it any more")
+
+    save_state(state_path, previous_state, fingerprints, done)
+    return len(done)
+
+if __name__ == "__main__":
+    args = parse_arguments()
+    if args.all:
+        generate_all(args.all, args.workers, args.force, args.compress)
+    else:
+        generate_folder(args.path, args.compress)
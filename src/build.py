@@ -0,0 +1,213 @@
+"""
+Single-pass build of funding_data and the DAOIP-5 files.
+
+Every upload CSV is parsed and its metadata decoded once, by the same loader
+(and incremental cache) as main.py. The consolidated funding_data outputs and
+the per-funder DAOIP-5 files written by daoip-5/scripts/CSV-to-JSON.py are
+both derived from that parse, so the two can never disagree about the rows.
+"""
+
+import argparse
+import importlib.util
+import logging
+import math
+import sys
+from pathlib import Path
+from types import ModuleType
+from typing import Any, Dict, Iterator, Tuple
+
+from pandas import DataFrame
+
+import profiling
+from compress import write_compressed
+from main import (
+    AMOUNT_TEXT_COL,
+    CSV_OUTPATH,
+    DATA_DIR,
+    PARSER_KEY,
+    build_argument_parser,
+    dedupe_stage,
+    export_funding_data,
+    finish_profiling,
+    output_options,
+    outputs_up_to_date,
+    start_profiling,
+    walk_funding_csvs,
+)
+from manifest import BuildManifest
+from metadata import METADATA_COL
+
+logger = logging.getLogger(__name__)
+
+FUNDERS_DIR = DATA_DIR / "funders"
+DAOIP5_SCRIPTS_DIR = Path(__file__).resolve().parent.parent / "daoip-5" / "scripts"
+# Columns of an upload row that the DAOIP-5 conversion reads
+DAOIP5_COLS = ["to_project_name", "amount", "funding_date", "grant_pool_name"]
+
+
+def load_csv_to_json() -> ModuleType:
+    """
+    Import daoip-5/scripts/CSV-to-JSON.py, whose file name is not a valid
+    module name.
+
+    Returns:
+        The loaded module
+    """
+    if str(DAOIP5_SCRIPTS_DIR) not in sys.path:
+        sys.path.insert(0, str(DAOIP5_SCRIPTS_DIR))
+    spec = importlib.util.spec_from_file_location(
+        "csv_to_json", DAOIP5_SCRIPTS_DIR / "CSV-to-JSON.py"
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def iter_daoip5_rows(frame: DataFrame) -> Iterator[Tuple[Dict[str, Any], Any]]:
+    """
+    Yield (row, metadata) pairs for CSV-to-JSON's write_applications.
+
+    Missing cells become empty strings, as csv.DictReader would return them,
+    the amount is the text from the CSV so that it is parsed exactly as
+    CSV-to-JSON.py parses it, and metadata is the already decoded object.
+
+    Args:
+        frame: Rows of one upload CSV, as loaded by load_funding_csv
+
+    Yields:
+        A row dict with the DAOIP5_COLS and its decoded metadata
+    """
+    columns = [
+        frame[AMOUNT_TEXT_COL if column == "amount" else column].tolist()
+        for column in DAOIP5_COLS
+    ]
+    for *values, metadata in zip(*columns, frame[METADATA_COL].tolist()):
+        row = {
+            column: "" if isinstance(value, float) and math.isnan(value) else value
+            for column, value in zip(DAOIP5_COLS, values)
+        }
+        yield row, metadata
+
+
+def export_daoip5(
+    df: DataFrame,
+    funders_dir: Path = FUNDERS_DIR,
+    force: bool = False,
+    compress: bool = False,
+) -> int:
+    """
+    Write the DAOIP-5 files of every funder whose inputs changed.
+
+    Stale files are found with the same content-hash state as
+    `CSV-to-JSON.py --all`, so either entry point can be used on a tree.
+    Files whose source CSV or funder was removed are deleted.
+
+    Args:
+        df: Combined DataFrame returned by walk_funding_csvs
+        funders_dir: Directory holding one folder per funder
+        force: Regenerate every file, ignoring the saved state
+        compress: Also write precompressed copies of each file
+
+    Returns:
+        Number of files written
+    """
+    csv_to_json = load_csv_to_json()
+    state_path = Path(csv_to_json.BASE_JSON_FOLDER) / csv_to_json.STATE_FILE
+    previous_state = csv_to_json.load_state(state_path)
+    jobs, grant_pool_jobs, fingerprints = csv_to_json.plan_all(
+        str(funders_dir), {} if force else previous_state, compress
+    )
+    frames = dict(tuple(df.groupby("file_path", sort=False)))
+
+    done = set()
+    for csv_file, dao_name, dao_type, file_name, _ in jobs:
+        frame = frames.get(str(Path(csv_file)))
+        if frame is None:
+            logger.error(f"Skipping DAOIP-5 applications for unloaded {csv_file}")
+            continue
+        try:
+            with open(file_name, "w") as outfile:
+                csv_to_json.write_applications(
+                    iter_daoip5_rows(frame), dao_name, dao_type, outfile
+                )
+        except Exception as e:
+            logger.error(f"Failed to generate DAOIP-5 applications for {csv_file}: {e}")
+            continue
+        if compress:
+            write_compressed(file_name)
+        done.add(str(Path(file_name).relative_to(csv_to_json.BASE_JSON_FOLDER)))
+
+    for yaml_file, dao_name, dao_type, file_name in grant_pool_jobs:
+        csv_to_json.write_output(
+            file_name,
+            csv_to_json.generate_grant_pool_json(yaml_file, dao_name, dao_type),
+            compress,
+        )
+        done.add(str(Path(file_name).relative_to(csv_to_json.BASE_JSON_FOLDER)))
+
+    for key in csv_to_json.remove_orphans(previous_state, fingerprints):
+        logger.info(f"Removed DAOIP-5 file {key}: no source generates it any more")
+
+    csv_to_json.save_state(state_path, previous_state, fingerprints, done)
+    logger.info(f"Wrote {len(done)} DAOIP-5 file(s)")
+    return len(done)
+
+
+def main() -> None:
+    """Build funding_data and the DAOIP-5 files from a single parse of the CSVs."""
+    parser = build_argument_parser()
+    parser.description = "Build funding_data and DAOIP-5 files from one parse."
+    parser.add_argument(
+        "--force-daoip5",
+        action="store_true",
+        help="Regenerate every DAOIP-5 file, ignoring the saved state",
+    )
+    args = parser.parse_args()
+    start_profiling(args)
+    try:
+        run_build(args)
+    finally:
+        finish_profiling(args)
+
+
+def run_build(args: argparse.Namespace) -> None:
+    """Run the single-pass build with the options parsed by main."""
+    manifest = None
+    if args.incremental:
+        manifest = BuildManifest.load(args.cache_dir, PARSER_KEY)
+
+    df = walk_funding_csvs(
+        DATA_DIR,
+        ignore_list=[CSV_OUTPATH],
+        manifest=manifest,
+        workers=args.workers,
+        engine=args.csv_engine,
+    )
+
+    if df.empty:
+        logger.warning("No data to export")
+        return
+
+    # The DAOIP-5 files mirror each source CSV, whose content hash is all
+    # their saved state records, so they are written from the frame before
+    # the dedupe stage.
+    deduped = dedupe_stage(df, args)
+
+    options = output_options(args)
+    if outputs_up_to_date(manifest, options):
+        logger.info("No source changes since the last build; outputs are up to date")
+    else:
+        export_funding_data(deduped, args.compress, manifest)
+        if manifest is not None:
+            manifest.record_outputs(options)
+
+    with profiling.stage("daoip5_export") as record:
+        record["rows"] = len(df)
+        export_daoip5(df, force=args.force_daoip5, compress=args.compress)
+
+    if manifest is not None and manifest.dirty:
+        manifest.save()
+
+
+if __name__ == "__main__":
+    main()
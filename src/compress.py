@@ -0,0 +1,63 @@
+import gzip
+import logging
+from pathlib import Path
+from typing import Callable, List, Tuple, Union
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; without it only .gz siblings are written
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+GZIP_LEVEL = 9
+BROTLI_QUALITY = 11
+
+
+def compressors() -> List[Tuple[str, Callable[[bytes], bytes]]]:
+    """
+    List the (suffix, compress function) pairs available in this environment.
+
+    gzip output has a fixed timestamp so identical inputs give identical files.
+    """
+    available = [(".gz", lambda data: gzip.compress(data, GZIP_LEVEL, mtime=0))]
+    if brotli is not None:
+        available.append(
+            (".br", lambda data: brotli.compress(data, quality=BROTLI_QUALITY))
+        )
+    return available
+
+
+def compressed_siblings(path: Path) -> List[Path]:
+    """
+    Paths of the precompressed siblings write_compressed creates for a file.
+    """
+    return [path.with_name(path.name + suffix) for suffix, _ in compressors()]
+
+
+def write_compressed(path: Union[str, Path]) -> List[Path]:
+    """
+    Write precompressed siblings (e.g. funding_data.json.gz) next to a file.
+
+    Each sibling is written to a temporary file and renamed into place, so
+    its modification time is never older than the file it was made from.
+
+    Args:
+        path: File to compress
+
+    Returns:
+        Paths of the siblings written
+    """
+    path = Path(path)
+    data = path.read_bytes()
+    written = []
+    for suffix, compress in compressors():
+        sibling = path.with_name(path.name + suffix)
+        tmp_path = sibling.with_name(sibling.name + ".tmp")
+        tmp_path.write_bytes(compress(data))
+        tmp_path.replace(sibling)
+        logger.info(
+            f"Compressed {path.name} to {sibling} ({sibling.stat().st_size:,} bytes)"
+        )
+        written.append(sibling)
+    return written
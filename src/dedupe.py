@@ -0,0 +1,230 @@
+import json
+import logging
+import math
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, List, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+from name_index import normalize
+
+logger = logging.getLogger(__name__)
+
+DEDUPE_MODES = ["off", "report", "flag", "drop"]
+DEFAULT_DEDUPE_KEY = [
+    "to_project_name",
+    "from_funder_name",
+    "grant_pool_name",
+    "funding_date",
+    "amount",
+]
+# Added to the outputs by the "flag" mode
+DUPLICATE_COL = "is_duplicate"
+# Relative difference up to which two amounts are considered the same grant
+NEAR_TOLERANCE = 0.01
+
+
+def missing_to_none(value: Any) -> Any:
+    return None if isinstance(value, float) and math.isnan(value) else value
+
+
+def row_numbers(dataframe: DataFrame) -> pd.Series:
+    """
+    1-based position of each row among the loaded rows of its source file.
+    """
+    return dataframe.groupby("file_path", sort=False).cumcount() + 1
+
+
+def near_clusters(
+    rows: List[Tuple[Any, int]], tolerance: float
+) -> List[List[Tuple[Any, int]]]:
+    """
+    Split (amount, row) pairs into clusters of amounts within tolerance of
+    the cluster's first (smallest) amount, so that a cluster never spans
+    more than the tolerance. Sorting first keeps this O(n log n) in the
+    group size.
+    """
+    rows = sorted(rows, key=lambda row: (row[0] is None, row[0] or 0))
+    clusters = [[rows[0]]]
+    for row in rows[1:]:
+        anchor = clusters[-1][0][0]
+        amount = row[0]
+        if (
+            amount is not None
+            and anchor is not None
+            and abs(amount - anchor) <= tolerance * max(abs(amount), abs(anchor))
+        ) or amount == anchor:
+            clusters[-1].append(row)
+        else:
+            clusters.append([row])
+    return [cluster for cluster in clusters if len(cluster) > 1]
+
+
+def find_duplicates(
+    dataframe: DataFrame,
+    key: Sequence[str] = DEFAULT_DEDUPE_KEY,
+    tolerance: float = NEAR_TOLERANCE,
+) -> Tuple[Dict[str, Any], np.ndarray]:
+    """
+    Find exact and near-duplicate grants in the consolidated data.
+
+    Exact duplicates are rows with identical values for every key column.
+    Near duplicates agree on the key once text columns are normalized (case
+    and punctuation ignored) and amounts are within `tolerance` of each other,
+    but are not exact duplicates of each other. Rows missing a text key
+    column (e.g. grants with no project name) don't identify a grant and are
+    never reported. Rows are bucketed by hashed keys, so the whole check runs
+    in roughly linear time.
+
+    Args:
+        dataframe: Combined DataFrame returned by walk_funding_csvs
+        key: Columns identifying a grant
+        tolerance: Relative difference up to which amounts are near-equal
+
+    Returns:
+        The conflict report, and a boolean array that is True for every
+        exact duplicate after its first occurrence
+
+    Raises:
+        ValueError: If a key column does not exist
+    """
+    missing = [column for column in key if column not in dataframe.columns]
+    if missing:
+        raise ValueError(f"Unknown dedupe key column(s): {', '.join(missing)}")
+
+    key = list(key)
+    text_key = [column for column in key if column != "amount"]
+    identified = dataframe[text_key].notna().all(axis=1).to_numpy()
+    duplicates = dataframe.duplicated(subset=key, keep="first").to_numpy()
+    duplicates &= identified
+
+    # Work on plain lists by position; label lookups dominate otherwise.
+    file_paths = dataframe["file_path"].tolist()
+    numbers = row_numbers(dataframe).tolist()
+    values = {
+        column: [missing_to_none(value) for value in dataframe[column].tolist()]
+        for column in key
+    }
+
+    def location(position: int) -> Dict[str, Any]:
+        return {"file_path": file_paths[position], "row": numbers[position]}
+
+    exact_groups: Dict[Tuple, List[int]] = {}
+    in_exact = dataframe.duplicated(subset=key, keep=False).to_numpy() & identified
+    for position in np.flatnonzero(in_exact).tolist():
+        group = tuple(values[column][position] for column in key)
+        exact_groups.setdefault(group, []).append(position)
+
+    exact = [
+        {
+            "key": dict(zip(key, group)),
+            "files": len({file_paths[position] for position in positions}),
+            "rows": [location(position) for position in positions],
+        }
+        for group, positions in exact_groups.items()
+    ]
+
+    # Near duplicates: bucket on the normalized text columns, then cluster the
+    # amounts within each bucket. Exact duplicates count as one row here.
+    # Funder and pool names repeat on every row; normalize each value once.
+    normalized = lru_cache(maxsize=None)(normalize)
+    coarse = list(
+        zip(
+            *[
+                [
+                    normalized(value) if isinstance(value, str) else value
+                    for value in values[column]
+                ]
+                for column in text_key
+            ]
+        )
+    ) or [()] * len(dataframe)
+    candidates = pd.Series(coarse).duplicated(keep=False).to_numpy()
+    candidates &= identified & ~duplicates
+    amounts = values.get("amount")
+    buckets: Dict[Tuple, List[Tuple[Any, int]]] = {}
+    for position in np.flatnonzero(candidates).tolist():
+        amount = amounts[position] if amounts is not None else 0
+        buckets.setdefault(coarse[position], []).append((amount, position))
+
+    near = [
+        {
+            "rows": [
+                {
+                    **location(position),
+                    **{column: values[column][position] for column in key},
+                }
+                for _, position in cluster
+            ]
+        }
+        for rows in buckets.values()
+        if len(rows) > 1
+        for cluster in near_clusters(rows, tolerance)
+    ]
+
+    report = {
+        "key": key,
+        "tolerance": tolerance,
+        "summary": {
+            "rows": len(dataframe),
+            "unidentified_rows": int((~identified).sum()),
+            "exact_groups": len(exact),
+            "cross_file_groups": sum(group["files"] > 1 for group in exact),
+            "duplicate_rows": int(duplicates.sum()),
+            "near_groups": len(near),
+        },
+        "exact": exact,
+        "near": near,
+    }
+    return report, duplicates
+
+
+def dedupe_funding_data(
+    dataframe: DataFrame,
+    mode: str = "report",
+    key: Sequence[str] = DEFAULT_DEDUPE_KEY,
+    tolerance: float = NEAR_TOLERANCE,
+    report_path: Union[str, Path, None] = None,
+) -> DataFrame:
+    """
+    Detect duplicate grants, write a conflict report and apply the mode.
+
+    Args:
+        dataframe: Combined DataFrame returned by walk_funding_csvs
+        mode: "report" only writes the report, "flag" also adds a boolean
+            DUPLICATE_COL marking exact duplicates after their first
+            occurrence, and "drop" removes those rows. Near duplicates are
+            only reported. "off" returns the data unchanged.
+        key: Columns identifying a grant
+        tolerance: Relative difference up to which amounts are near-equal
+        report_path: Where to write the JSON conflict report, if anywhere
+
+    Returns:
+        The DataFrame to export
+    """
+    if mode == "off":
+        return dataframe
+    if mode not in DEDUPE_MODES:
+        raise ValueError(f"Unknown dedupe mode {mode!r}")
+
+    report, duplicates = find_duplicates(dataframe, key, tolerance)
+    summary = report["summary"]
+    logger.info(
+        f"Duplicates: {summary['duplicate_rows']} duplicate rows in "
+        f"{summary['exact_groups']} groups ({summary['cross_file_groups']} "
+        f"across files), {summary['near_groups']} near-duplicate groups"
+    )
+
+    if report_path is not None:
+        with open(report_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        logger.info(f"Exported duplicate report to {report_path}")
+
+    if mode == "flag":
+        return dataframe.assign(**{DUPLICATE_COL: duplicates})
+    if mode == "drop":
+        return dataframe.loc[~duplicates].reset_index(drop=True)
+    return dataframe
@@ -0,0 +1,321 @@
+"""
+Aggregate queries over the consolidated funding dataset.
+
+The Parquet dataset written by main.py (one partition per funder, with the
+well-known metadata keys as their own columns) is queried in place with
+DuckDB. Filters become SQL predicates that DuckDB pushes into the scan:
+funder filters skip whole partitions, and date, pool and project filters are
+checked against row-group statistics before any rows are decoded.
+
+Example:
+    uv run python src/funding_query.py --group-by funder,year --project uniswap
+"""
+
+import argparse
+import csv
+import json
+import sys
+import threading
+from datetime import date
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+import duckdb
+
+# Written by main.py
+PARQUET_PATH = Path("data") / "funding_data.parquet"
+# Dimensions a query can group by, and the SQL expression for each
+DIMENSIONS = {
+    "project": "to_project_name",
+    "funder": "from_funder_name",
+    "pool": "grant_pool_name",
+    "year": "CAST(year(funding_date) AS INTEGER)",
+    "month": "strftime(funding_date, '%Y-%m')",
+    "token_unit": "token_unit",
+}
+# Aggregates returned for every group
+MEASURES = {
+    "grants": "count(*)",
+    "amount": "sum(amount)",
+    "projects": "count(DISTINCT to_project_name)",
+}
+OUTPUT_FORMATS = ["table", "json", "csv"]
+# Written by main.py --dedupe flag; flagged rows are left out of aggregates
+DUPLICATE_COL = "is_duplicate"
+
+
+def parse_date(value: Union[str, date, None], name: str) -> Optional[date]:
+    """
+    Parse an ISO (YYYY-MM-DD) date filter.
+
+    Raises:
+        ValueError: If the value is not an ISO date
+    """
+    if value is None or isinstance(value, date):
+        return value
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"'{name}' must be a YYYY-MM-DD date, got {value!r}")
+
+
+class FundingQuery:
+    """
+    Parameterized aggregate queries over the funding Parquet dataset.
+
+    The dataset is read at query time, so results always reflect the last
+    build. A single in-memory DuckDB database is shared by all threads; each
+    query runs on its own cursor.
+    """
+
+    def __init__(self, parquet_path: Union[str, Path] = PARQUET_PATH):
+        self.parquet_path = Path(parquet_path)
+        self._connection = duckdb.connect()
+        self._lock = threading.Lock()
+
+    def _source(self) -> str:
+        if not self.parquet_path.is_dir():
+            raise FileNotFoundError(
+                f"Funding dataset {self.parquet_path} not found; run src/main.py"
+            )
+        pattern = str(self.parquet_path / "**" / "*.parquet").replace("'", "''")
+        return f"read_parquet('{pattern}', hive_partitioning = true)"
+
+    def _cursor(self) -> duckdb.DuckDBPyConnection:
+        with self._lock:
+            return self._connection.cursor()
+
+    def aggregate(
+        self,
+        group_by: Sequence[str] = (),
+        projects: Sequence[str] = (),
+        funders: Sequence[str] = (),
+        pools: Sequence[str] = (),
+        date_from: Union[str, date, None] = None,
+        date_to: Union[str, date, None] = None,
+        sort: Optional[str] = None,
+        limit: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Count grants, sum amounts and count distinct projects per group.
+
+        Rows flagged as duplicates (DUPLICATE_COL) are not counted, matching
+        the rollups written by the build.
+
+        Args:
+            group_by: Keys of DIMENSIONS to group by; no keys gives one total
+            projects: Only include grants to these projects
+            funders: Only include grants from these funders
+            pools: Only include grants from these grant pools
+            date_from: Only include grants funded on or after this date
+            date_to: Only include grants funded on or before this date
+            sort: Dimension or measure to sort by, prefixed with "-" for
+                descending order (default: "-amount")
+            limit: Maximum number of groups to return
+
+        Returns:
+            One dict per group with the group_by dimensions and MEASURES
+
+        Raises:
+            ValueError: If a dimension, sort key, date or limit is invalid
+            FileNotFoundError: If the dataset has not been built
+        """
+        unknown = [key for key in group_by if key not in DIMENSIONS]
+        if unknown:
+            raise ValueError(
+                f"Unknown group_by {', '.join(unknown)}; "
+                f"expected any of {', '.join(DIMENSIONS)}"
+            )
+        sort = sort or "-amount"
+        sort_key = sort.lstrip("-")
+        if sort_key not in MEASURES and sort_key not in group_by:
+            raise ValueError(
+                f"Cannot sort by {sort_key!r}; "
+                "expected a measure or one of the group_by dimensions"
+            )
+        if limit is not None and limit < 0:
+            raise ValueError("'limit' must be a non-negative integer")
+
+        conditions = []
+        params: List[Any] = []
+        for column, values in [
+            ("from_funder_name", funders),
+            ("grant_pool_name", pools),
+            ("to_project_name", projects),
+        ]:
+            if values:
+                conditions.append(f"{column} IN ({', '.join('?' * len(values))})")
+                params.extend(values)
+        for operator, value, name in [
+            (">=", date_from, "from"),
+            ("<=", date_to, "to"),
+        ]:
+            value = parse_date(value, name)
+            if value is not None:
+                conditions.append(f"funding_date {operator} ?")
+                params.append(value)
+
+        source = self._source()
+        cursor = self._cursor()
+        try:
+            schema = cursor.execute(f"DESCRIBE SELECT * FROM {source}").fetchall()
+        finally:
+            cursor.close()
+        if any(column[0] == DUPLICATE_COL for column in schema):
+            conditions.append(f"NOT coalesce({DUPLICATE_COL}, false)")
+
+        columns = [f"{DIMENSIONS[key]} AS {key}" for key in group_by]
+        columns += [f"{sql} AS {key}" for key, sql in MEASURES.items()]
+        query = f"SELECT {', '.join(columns)} FROM {source}"
+        if conditions:
+            query += f" WHERE {' AND '.join(conditions)}"
+        if group_by:
+            query += f" GROUP BY {', '.join(group_by)}"
+        direction = "DESC" if sort.startswith("-") else "ASC"
+        tiebreak = "".join(f", {key}" for key in group_by if key != sort_key)
+        query += f" ORDER BY {sort_key} {direction} NULLS LAST{tiebreak}"
+        if limit is not None:
+            query += f" LIMIT {int(limit)}"
+
+        cursor = self._cursor()
+        try:
+            result = cursor.execute(query, params)
+            names = [column[0] for column in result.description]
+            return [dict(zip(names, row)) for row in result.fetchall()]
+        finally:
+            cursor.close()
+
+    def sql(self, query: str) -> List[Dict[str, Any]]:
+        """
+        Run an arbitrary SQL query, with the dataset available as `funding`.
+
+        Args:
+            query: SQL query text
+
+        Returns:
+            One dict per result row
+        """
+        cursor = self._cursor()
+        try:
+            cursor.execute(
+                f"CREATE OR REPLACE TEMP VIEW funding AS FROM {self._source()}"
+            )
+            result = cursor.execute(query)
+            names = [column[0] for column in result.description]
+            return [dict(zip(names, row)) for row in result.fetchall()]
+        finally:
+            cursor.close()
+
+
+def split_list(values: Optional[List[str]]) -> List[str]:
+    """
+    Flatten repeated, comma-separated option values (e.g. --group-by).
+    """
+    return [
+        item.strip()
+        for value in values or []
+        for item in value.split(",")
+        if item.strip()
+    ]
+
+
+def print_rows(rows: List[Dict[str, Any]], output_format: str) -> None:
+    """
+    Write query results to stdout as an aligned table, JSON or CSV.
+    """
+    if output_format == "json":
+        print(json.dumps(rows, indent=2, default=str))
+        return
+    if not rows:
+        return
+
+    names = list(rows[0])
+    if output_format == "csv":
+        writer = csv.DictWriter(sys.stdout, fieldnames=names)
+        writer.writeheader()
+        writer.writerows(rows)
+        return
+
+    cells = [names] + [
+        ["" if row[name] is None else str(row[name]) for name in names] for row in rows
+    ]
+    widths = [max(len(line[i]) for line in cells) for i in range(len(names))]
+    for line in cells:
+        print("  ".join(cell.ljust(width) for cell, width in zip(line, widths)))
+
+
+def main() -> None:
+    """Main entry point for the script."""
+    parser = argparse.ArgumentParser(
+        description="Aggregate the consolidated funding dataset with SQL."
+    )
+    parser.add_argument(
+        "--data",
+        type=Path,
+        default=PARQUET_PATH,
+        help=f"Parquet dataset written by main.py (default: {PARQUET_PATH})",
+    )
+    parser.add_argument(
+        "--group-by",
+        action="append",
+        help=f"Dimensions to group by, comma-separated: {', '.join(DIMENSIONS)}",
+    )
+    parser.add_argument(
+        "--project",
+        action="append",
+        help="Only include grants to this project (repeatable)",
+    )
+    parser.add_argument(
+        "--funder",
+        action="append",
+        help="Only include grants from this funder (repeatable)",
+    )
+    parser.add_argument(
+        "--pool",
+        action="append",
+        help="Only include grants from this pool (repeatable)",
+    )
+    parser.add_argument("--from", dest="date_from", help="Earliest funding date")
+    parser.add_argument("--to", dest="date_to", help="Latest funding date")
+    parser.add_argument(
+        "--sort",
+        help="Dimension or measure to sort by, '-' prefix for descending "
+        "(default: -amount)",
+    )
+    parser.add_argument("--limit", type=int, help="Maximum number of rows")
+    parser.add_argument(
+        "--sql",
+        help="Run this SQL query instead; the dataset is available as `funding`",
+    )
+    parser.add_argument(
+        "--format",
+        choices=OUTPUT_FORMATS,
+        default="table",
+        help="Output format (default: table)",
+    )
+    args = parser.parse_args()
+
+    engine = FundingQuery(args.data)
+    try:
+        if args.sql:
+            rows = engine.sql(args.sql)
+        else:
+            rows = engine.aggregate(
+                group_by=split_list(args.group_by),
+                projects=args.project or [],
+                funders=args.funder or [],
+                pools=args.pool or [],
+                date_from=args.date_from,
+                date_to=args.date_to,
+                sort=args.sort,
+                limit=args.limit,
+            )
+    except (ValueError, FileNotFoundError, duckdb.Error) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    print_rows(rows, args.format)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,46 @@
+import argparse
+import hashlib
 import json
 import logging
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import List, Optional, Union
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+from urllib.parse import quote
 
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 from pandas import DataFrame
 
+import profiling
+from compress import compressed_siblings, write_compressed
+from dedupe import (
+    DEDUPE_MODES,
+    DEFAULT_DEDUPE_KEY,
+    DUPLICATE_COL,
+    NEAR_TOLERANCE,
+    dedupe_funding_data,
+)
+from manifest import BuildManifest
+from metadata import METADATA_COL, METADATA_KEYS, decode_metadata, metadata_to_map
+from rollups import rollup_paths, write_rollups
+
 logging.basicConfig(
     level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
 )
 logger = logging.getLogger(__name__)
 
 DATA_DIR = Path("data")
+CACHE_DIR = Path(".cache") / "funding_data"
 OUT_NAME = "funding_data"
+CSV_OUTPATH = DATA_DIR / f"{OUT_NAME}.csv"
+JSON_OUTPATH = DATA_DIR / f"{OUT_NAME}.json"
+PARQUET_OUTPATH = DATA_DIR / f"{OUT_NAME}.parquet"
+ROLLUPS_OUTDIR = DATA_DIR / "rollups"
+DUPLICATES_OUTPATH = DATA_DIR / f"{OUT_NAME}_duplicates.json"
 REQ_COLS = [
     "to_project_name",
     "amount",
@@ -21,22 +49,154 @@ REQ_COLS = [
     "grant_pool_name",
     "metadata",
 ]
+EXPORT_COLS = REQ_COLS + ["file_path"]
+# The amount as written in the CSV. pandas' float parser can be off by an ulp,
+# so outputs that must match float(text) exactly (DAOIP-5) parse this instead.
+AMOUNT_TEXT_COL = "amount_text"
+# Declared type of each required column. Everything is read as text and then
+# checked against this schema, so bad cells are reported instead of silently
+# turning a whole column into mixed types.
+CSV_SCHEMA = {
+    "to_project_name": "string",
+    "amount": "float64",
+    "funding_date": "date",
+    "from_funder_name": "string",
+    "grant_pool_name": "string",
+    "metadata": "string",
+}
+DATE_FORMAT = "%Y-%m-%d"
+CSV_ENGINES = ["c", "pyarrow"]
+MAX_LOGGED_MISMATCHES = 10
+# Bump whenever load_funding_csv changes the shape of what it returns, so that
+# frames cached by an older parser are not reused.
+PARSER_VERSION = 5
+JSON_BATCH_SIZE = 1000
+PARTITION_COL = "from_funder_name"
+# Partition directory name for rows without a funder, as in Hive
+NULL_PARTITION = "__HIVE_DEFAULT_PARTITION__"
+PARQUET_SCHEMA = pa.schema(
+    [
+        ("to_project_name", pa.string()),
+        ("amount", pa.float64()),
+        ("funding_date", pa.date32()),
+        ("from_funder_name", pa.dictionary(pa.int32(), pa.string())),
+        ("grant_pool_name", pa.dictionary(pa.int32(), pa.string())),
+        ("metadata", pa.map_(pa.string(), pa.string())),
+        ("file_path", pa.string()),
+        ("application_name", pa.string()),
+        ("application_url", pa.string()),
+        ("token_amount", pa.float64()),
+        ("token_unit", pa.string()),
+    ]
+)
+# Stages run under cProfile with --cprofile
+CPROFILE_STAGES = [
+    "parse",
+    "decode_metadata",
+    "concat",
+    "json_export",
+    "csv_export",
+    "parquet_export",
+]
+PARSER_KEY = hashlib.sha256(
+    json.dumps({"version": PARSER_VERSION, "schema": CSV_SCHEMA}).encode()
+).hexdigest()
+
+
+def report_mismatches(
+    raw: pd.Series, parsed: pd.Series, column: str, source: str
+) -> None:
+    """
+    Log the rows whose non-empty value could not be parsed as the column type.
+
+    Args:
+        raw: Column values as read from the CSV
+        parsed: The same values after coercion, NaN/NaT where parsing failed
+        column: Name of the column
+        source: Path of the CSV, for log messages
+    """
+    mismatched = raw.notna() & parsed.isna()
+    if not mismatched.any():
+        return
+
+    rows = [
+        f"row {index + 1} ({value!r})"
+        for index, value in raw[mismatched].head(MAX_LOGGED_MISMATCHES).items()
+    ]
+    more = mismatched.sum() - len(rows)
+    suffix = f" and {more} more" if more > 0 else ""
+    logger.warning(
+        f"Type mismatch in {source}: {column} expects {CSV_SCHEMA[column]}, "
+        f"got {', '.join(rows)}{suffix}"
+    )
+
+
+def apply_schema(df: DataFrame, source: str) -> DataFrame:
+    """
+    Coerce the required columns to CSV_SCHEMA, reporting cells that don't fit.
+
+    Text columns become object columns with NaN for missing cells, whichever
+    engine read them. Numeric columns become float64 with unparseable cells
+    set to NaN. Dates are validated against DATE_FORMAT but kept as text.
 
+    Args:
+        df: DataFrame read with every required column as text
+        source: Path of the CSV, for log messages
+
+    Returns:
+        The same DataFrame with numeric columns converted
+    """
+    for column, dtype in CSV_SCHEMA.items():
+        text = df[column]
+        df[column] = text.astype(object).where(text.notna(), np.nan)
 
-def load_funding_csv(csv_file_path: Union[str, Path]) -> DataFrame:
+        if dtype == "float64":
+            parsed = pd.to_numeric(df[column], errors="coerce")
+            report_mismatches(df[column], parsed, column, source)
+            df[column] = parsed.astype(dtype)
+        elif dtype == "date":
+            parsed = pd.to_datetime(df[column], format=DATE_FORMAT, errors="coerce")
+            report_mismatches(df[column], parsed, column, source)
+    return df
+
+
+def load_funding_csv(
+    csv_file_path: Union[str, Path], engine: Optional[str] = None
+) -> DataFrame:
     """
-    Load a CSV file and extract the required columns.
+    Load a CSV file, extract the required columns and decode its metadata.
+
+    Only the columns in CSV_SCHEMA are read, and cells that don't match their
+    declared type are reported per row.
 
     Args:
         csv_file_path: Path to the CSV file
+        engine: pandas CSV engine to use, e.g. "pyarrow" for multi-threaded
+            parsing; defaults to the C engine
 
     Returns:
-        DataFrame containing the required columns or empty DataFrame if an error occurs
+        DataFrame containing the required columns plus the decoded metadata
+        columns, or empty DataFrame if an error occurs
     """
     try:
-        df = pd.read_csv(csv_file_path)
-        df = df[REQ_COLS]
-        df["file_path"] = str(csv_file_path)
+        with profiling.stage("parse", file=str(csv_file_path)) as record:
+            df = pd.read_csv(
+                csv_file_path,
+                usecols=REQ_COLS,
+                dtype={column: "string" for column in REQ_COLS},
+                engine=engine,
+            )
+            df = df.reindex(columns=REQ_COLS)
+            df[AMOUNT_TEXT_COL] = (
+                df["amount"].astype(object).where(df["amount"].notna(), np.nan)
+            )
+            apply_schema(df, source=str(csv_file_path))
+            df["file_path"] = str(csv_file_path)
+            record["rows"] = len(df)
+            record["bytes"] = os.path.getsize(csv_file_path)
+        with profiling.stage("decode_metadata", file=str(csv_file_path)) as record:
+            decode_metadata(df, source=str(csv_file_path))
+            record["rows"] = len(df)
         logger.info(f"Loaded CSV at: {csv_file_path}")
         return df
     except Exception as e:
@@ -44,8 +204,78 @@ def load_funding_csv(csv_file_path: Union[str, Path]) -> DataFrame:
         return pd.DataFrame()
 
 
+def load_funding_csv_profiled(
+    csv_file_path: Union[str, Path],
+    engine: Optional[str] = None,
+    cprofile_stages: Optional[List[str]] = None,
+) -> Tuple[DataFrame, List[Dict[str, Any]], Dict[str, Dict]]:
+    """
+    load_funding_csv for worker processes of a profiled build: also returns
+    the stages recorded while loading and the cProfile statistics of
+    cprofile_stages, for the parent to merge.
+    """
+    profiler = profiling.enable(cprofile_stages)
+    df = load_funding_csv(csv_file_path, engine)
+    return df, profiler.records, profiler.cprofile_stats()
+
+
+def load_funding_csvs(
+    file_paths: List[str], workers: int = 1, engine: Optional[str] = None
+) -> List[DataFrame]:
+    """
+    Load several CSV files, optionally across a pool of worker processes.
+
+    Args:
+        file_paths: Paths of the CSV files to load
+        workers: Number of worker processes; 1 loads serially in this process
+            and 0 uses one worker per CPU
+        engine: pandas CSV engine passed to load_funding_csv
+
+    Returns:
+        One DataFrame per path, in the same order as file_paths. Files that
+        fail to load yield an empty DataFrame.
+    """
+    if workers == 0:
+        workers = os.cpu_count() or 1
+    workers = min(workers, len(file_paths))
+    if workers <= 1:
+        return [load_funding_csv(file_path, engine) for file_path in file_paths]
+
+    dataframes = []
+    profiler = profiling.current()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        if profiler is None:
+            futures = [
+                executor.submit(load_funding_csv, file_path, engine)
+                for file_path in file_paths
+            ]
+        else:
+            cprofile_stages = sorted(profiler.cprofile_stages)
+            futures = [
+                executor.submit(
+                    load_funding_csv_profiled, file_path, engine, cprofile_stages
+                )
+                for file_path in file_paths
+            ]
+        for file_path, future in zip(file_paths, futures):
+            try:
+                result = future.result()
+                if profiler is not None:
+                    result, records, cprofile_stats = result
+                    profiling.add_records(records, cprofile_stats)
+                dataframes.append(result)
+            except Exception as e:
+                logger.error(f"Error reading {file_path}: {e}")
+                dataframes.append(pd.DataFrame())
+    return dataframes
+
+
 def walk_funding_csvs(
-    data_dir: Union[str, Path], ignore_list: Optional[List[Union[str, Path]]] = None
+    data_dir: Union[str, Path],
+    ignore_list: Optional[List[Union[str, Path]]] = None,
+    manifest: Optional[BuildManifest] = None,
+    workers: int = 1,
+    engine: Optional[str] = None,
 ) -> DataFrame:
     """
     Walk through a directory tree to find and process CSV files.
@@ -53,76 +283,463 @@ def walk_funding_csvs(
     Args:
         data_dir: The root directory to walk through
         ignore_list: List of file paths to ignore
+        manifest: Optional build manifest; unchanged files are served from its
+            cache and only changed or added files are parsed
+        workers: Number of worker processes used to parse CSVs (see
+            load_funding_csvs)
+        engine: pandas CSV engine passed to load_funding_csv
 
     Returns:
         Combined DataFrame of all CSVs or empty DataFrame if none found
     """
     ignore_list = set(str(Path(p)) for p in (ignore_list or []))
-    dataframes = []
+    with profiling.stage("discovery") as record:
+        file_paths = [
+            str(path)
+            for path in Path(data_dir).glob("**/*.csv")
+            if str(path) not in ignore_list
+        ]
+        record["rows"] = len(file_paths)
+
+    frames = {}
+    if manifest is not None:
+        with profiling.stage("cache_lookup") as record:
+            for file_path in file_paths:
+                df = manifest.lookup(file_path)
+                if df is not None:
+                    frames[file_path] = df
+            record["rows"] = len(frames)
+    reused = len(frames)
 
-    for path in Path(data_dir).glob("**/*.csv"):
-        file_path = str(path)
-        if file_path not in ignore_list:
-            df = load_funding_csv(file_path)
-            if not df.empty:
-                dataframes.append(df)
+    to_parse = [file_path for file_path in file_paths if file_path not in frames]
+    for file_path, df in zip(to_parse, load_funding_csvs(to_parse, workers, engine)):
+        if manifest is not None and not df.empty:
+            manifest.store(file_path, df)
+        frames[file_path] = df
+
+    # Concatenate in walk order regardless of which files came from the cache
+    # or finished first, so row order is stable between builds.
+    loaded_paths = [
+        file_path for file_path in file_paths if not frames[file_path].empty
+    ]
+    dataframes = [frames[file_path] for file_path in loaded_paths]
+
+    if manifest is not None:
+        removed = manifest.prune(loaded_paths)
+        logger.info(
+            f"Incremental build: {reused} cached, "
+            f"{len(loaded_paths) - reused} parsed, {removed} removed"
+        )
 
     if dataframes:
-        return pd.concat(dataframes, ignore_index=True)
+        with profiling.stage("concat") as record:
+            df = pd.concat(dataframes, ignore_index=True)
+            record["rows"] = len(df)
+            record["bytes"] = int(df.memory_usage(index=True).sum())
+        return df
 
     logger.warning("No CSV files found.")
     return pd.DataFrame()
 
 
+def export_columns(dataframe: DataFrame) -> List[str]:
+    """
+    Columns written to the JSON and CSV outputs: EXPORT_COLS, plus the
+    duplicate flag when the dedupe stage added it.
+    """
+    if DUPLICATE_COL in dataframe.columns:
+        return EXPORT_COLS + [DUPLICATE_COL]
+    return EXPORT_COLS
+
+
+def iter_export_records(
+    dataframe: DataFrame, batch_size: int = JSON_BATCH_SIZE
+) -> Iterator[Dict[str, Any]]:
+    """
+    Yield one export record per row, converting a batch of rows at a time.
+
+    Args:
+        dataframe: The DataFrame to export
+        batch_size: Number of rows materialized as Python objects at once
+
+    Yields:
+        Grant records with metadata decoded and missing values normalized
+    """
+    columns = export_columns(dataframe)
+
+    for start in range(0, len(dataframe), batch_size):
+        batch = dataframe.iloc[start : start + batch_size]
+        values = []
+        for column in columns:
+            series = batch[METADATA_COL if column == "metadata" else column]
+            if column == "amount":
+                series = series.fillna(0)
+            elif column == "funding_date":
+                series = series.fillna("")
+            values.append(series.tolist())
+
+        for row in zip(*values):
+            grant = dict(zip(columns, row))
+            if not isinstance(grant["to_project_name"], str):
+                grant["to_project_name"] = None
+            yield grant
+
+
 def json_export(dataframe: DataFrame, json_outpath: Union[str, Path]) -> None:
     """
     Export DataFrame to JSON file with appropriate data transformations.
 
+    Records are written one at a time, so memory stays flat as the dataset
+    grows. The output is byte-for-byte what json.dump(records, indent=2)
+    would produce.
+
     Args:
         dataframe: The DataFrame to export
         json_outpath: Path to save the JSON file
     """
-    df_export = dataframe.copy()
+    with open(json_outpath, "w", encoding="utf-8") as json_file:
+        json_file.write("[")
+        empty = True
+        for grant in iter_export_records(dataframe):
+            json_file.write("\n  " if empty else ",\n  ")
+            # Nest each record one level deeper, as json.dump would inside a list.
+            json_file.write(json.dumps(grant, indent=2).replace("\n", "\n  "))
+            empty = False
+        json_file.write("]" if empty else "\n]")
 
-    df_export["amount"] = df_export["amount"].fillna(0)
-    df_export["funding_date"] = df_export["funding_date"].fillna("")
+    logger.info(f"Exported to {json_outpath}")
 
-    data = df_export.to_dict(orient="records")
 
-    for grant in data:
-        if not isinstance(grant["to_project_name"], str):
-            grant["to_project_name"] = None
+def to_arrow_table(dataframe: DataFrame) -> pa.Table:
+    """
+    Convert the consolidated DataFrame into a typed Arrow table.
 
-        try:
-            grant["metadata"] = json.loads(grant["metadata"])
-        except json.JSONDecodeError:
-            logger.warning(f"Invalid JSON in metadata: {grant['metadata']}")
-            grant["metadata"] = {}
+    Args:
+        dataframe: The DataFrame to convert
 
-    with open(json_outpath, "w", encoding="utf-8") as json_file:
-        json.dump(data, json_file, indent=2)
+    Returns:
+        Table conforming to PARQUET_SCHEMA, with a trailing DUPLICATE_COL
+        field if the dedupe stage flagged duplicates
+    """
 
-    logger.info(f"Exported to {json_outpath}")
+    def strings(column: str) -> pa.Array:
+        return pa.array(dataframe[column].astype("string"), type=pa.string())
 
+    amount = pd.to_numeric(dataframe["amount"], errors="coerce").fillna(0)
+    funding_date = pd.to_datetime(
+        dataframe["funding_date"], format="%Y-%m-%d", errors="coerce"
+    )
+
+    arrays = [
+        strings("to_project_name"),
+        pa.array(amount, type=pa.float64()),
+        pa.array(funding_date.dt.date, type=pa.date32(), from_pandas=True),
+        strings("from_funder_name").dictionary_encode(),
+        strings("grant_pool_name").dictionary_encode(),
+        pa.array(
+            [metadata_to_map(value) for value in dataframe[METADATA_COL]],
+            type=PARQUET_SCHEMA.field("metadata").type,
+        ),
+        strings("file_path"),
+        *[
+            pa.array(dataframe[key], type=PARQUET_SCHEMA.field(key).type)
+            for key in METADATA_KEYS
+        ],
+    ]
+    schema = PARQUET_SCHEMA
+    if DUPLICATE_COL in dataframe.columns:
+        arrays.append(pa.array(dataframe[DUPLICATE_COL], type=pa.bool_()))
+        schema = schema.append(pa.field(DUPLICATE_COL, pa.bool_()))
+
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+
+def parquet_export(dataframe: DataFrame, parquet_outpath: Union[str, Path]) -> None:
+    """
+    Export DataFrame to a Parquet dataset partitioned by funder.
+
+    The dataset is laid out as <parquet_outpath>/from_funder_name=<funder>/,
+    so readers can load only the funders and columns they need. Each
+    partition is written with pq.write_table rather than pyarrow's dataset
+    writer, whose teardown intermittently aborted the process at exit.
+
+    Args:
+        dataframe: The DataFrame to export
+        parquet_outpath: Directory to write the dataset to; replaced if it exists
+    """
+    table = to_arrow_table(dataframe).drop_columns([PARTITION_COL])
+    partitions = dataframe.groupby(PARTITION_COL, sort=False, dropna=False).indices
+
+    if Path(parquet_outpath).exists():
+        shutil.rmtree(parquet_outpath)
+    for funder, index in partitions.items():
+        value = NULL_PARTITION if pd.isna(funder) else quote(funder, safe="")
+        partition_dir = Path(parquet_outpath) / f"{PARTITION_COL}={value}"
+        partition_dir.mkdir(parents=True)
+        pq.write_table(table.take(index), partition_dir / "part-0.parquet")
+
+    logger.info(f"Exported to {parquet_outpath}")
 
-def main() -> None:
-    """Main function to process funding CSVs and export to JSON and CSV."""
-    csv_outpath = DATA_DIR / f"{OUT_NAME}.csv"
-    json_outpath = DATA_DIR / f"{OUT_NAME}.json"
 
-    df = walk_funding_csvs(DATA_DIR, ignore_list=[csv_outpath])
+def export_funding_data(
+    df: DataFrame,
+    compress: bool = False,
+    manifest: Optional[BuildManifest] = None,
+) -> None:
+    """
+    Write the consolidated funding_data JSON, CSV and Parquet outputs and
+    the rollup tables.
+
+    Args:
+        df: Combined DataFrame returned by walk_funding_csvs
+        compress: Also write precompressed copies of the JSON and CSV
+        manifest: Build manifest of an incremental build; rollup partials of
+            unchanged files are reused from its cache
+    """
+    with profiling.stage("json_export") as record:
+        json_export(df, JSON_OUTPATH)
+        record["rows"] = len(df)
+        record["bytes"] = JSON_OUTPATH.stat().st_size
+
+    with profiling.stage("csv_export") as record:
+        df_csv = df[export_columns(df)].copy()
+        df_csv["amount"] = df_csv["amount"].fillna(0)
+        df_csv.set_index(REQ_COLS[0], drop=True, inplace=True)
+        df_csv.to_csv(CSV_OUTPATH)
+        logger.info(f"Exported to {CSV_OUTPATH}")
+        record["rows"] = len(df)
+        record["bytes"] = CSV_OUTPATH.stat().st_size
+
+    with profiling.stage("parquet_export") as record:
+        parquet_export(df, PARQUET_OUTPATH)
+        record["rows"] = len(df)
+        record["bytes"] = sum(
+            path.stat().st_size for path in PARQUET_OUTPATH.glob("**/*.parquet")
+        )
+
+    with profiling.stage("rollups") as record:
+        write_rollups(df, ROLLUPS_OUTDIR, manifest)
+        record["rows"] = len(df)
+
+    if compress:
+        with profiling.stage("compress"):
+            write_compressed(JSON_OUTPATH)
+            write_compressed(CSV_OUTPATH)
+
+
+def dedupe_key_columns(value: str) -> List[str]:
+    """
+    Parse --dedupe-key into a list of CSV columns.
+
+    Raises:
+        argparse.ArgumentTypeError: If a column is not in CSV_SCHEMA, so that
+            the parser reports it as a usage error
+    """
+    columns = [column.strip() for column in value.split(",") if column.strip()]
+    unknown = [column for column in columns if column not in CSV_SCHEMA]
+    if not columns or unknown:
+        raise argparse.ArgumentTypeError(
+            f"unknown column(s) {', '.join(unknown) or repr(value)}; "
+            f"expected any of {', '.join(CSV_SCHEMA)}"
+        )
+    return columns
+
+
+def output_options(args: argparse.Namespace) -> Dict[str, Any]:
+    """
+    The options from build_argument_parser that change the outputs, recorded
+    in the manifest of an incremental build.
+    """
+    return {
+        "compress": args.compress,
+        "dedupe": args.dedupe,
+        "dedupe_key": args.dedupe_key,
+        "near_tolerance": args.near_tolerance,
+    }
+
+
+def outputs_up_to_date(
+    manifest: Optional[BuildManifest], options: Dict[str, Any]
+) -> bool:
+    """
+    Check whether an incremental build can skip writing the outputs.
+
+    Args:
+        manifest: Build manifest of an incremental build, or None
+        options: Output options of this build, from output_options
+
+    Returns:
+        True if no source changed, the outputs were last written with the
+        same options and every output still exists
+    """
+    outputs = [JSON_OUTPATH, CSV_OUTPATH, PARQUET_OUTPATH]
+    outputs += rollup_paths(ROLLUPS_OUTDIR)
+    if options["compress"]:
+        outputs += compressed_siblings(JSON_OUTPATH) + compressed_siblings(CSV_OUTPATH)
+    return (
+        manifest is not None
+        and not manifest.changed
+        and manifest.outputs == options
+        and all(path.exists() for path in outputs)
+    )
+
+
+def dedupe_stage(df: DataFrame, args: argparse.Namespace) -> DataFrame:
+    """
+    Run the dedupe stage with the options from build_argument_parser.
+    """
+    with profiling.stage("dedupe") as record:
+        record["rows"] = len(df)
+        return dedupe_funding_data(
+            df,
+            mode=args.dedupe,
+            key=args.dedupe_key,
+            tolerance=args.near_tolerance,
+            report_path=args.dedupe_report,
+        )
+
+
+def build_argument_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description="Consolidate funder CSV uploads into funding_data outputs."
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Only re-parse source CSVs that changed since the last build",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        type=Path,
+        default=CACHE_DIR,
+        help=f"Directory for the incremental build manifest (default: {CACHE_DIR})",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of processes used to parse CSVs (0 = one per CPU, default: 1)",
+    )
+    parser.add_argument(
+        "--compress",
+        action="store_true",
+        help="Also write .gz (and, with brotli installed, .br) copies of the JSON and CSV",
+    )
+    parser.add_argument(
+        "--dedupe",
+        choices=DEDUPE_MODES,
+        default="report",
+        help="Duplicate grants: only report them, flag them in the outputs "
+        "with an is_duplicate column, drop them, or skip the check "
+        "(default: report)",
+    )
+    parser.add_argument(
+        "--dedupe-key",
+        type=dedupe_key_columns,
+        default=",".join(DEFAULT_DEDUPE_KEY),
+        help="Comma-separated columns identifying a grant "
+        f"(default: {','.join(DEFAULT_DEDUPE_KEY)})",
+    )
+    parser.add_argument(
+        "--near-tolerance",
+        type=float,
+        default=NEAR_TOLERANCE,
+        help="Relative amount difference up to which grants are reported as "
+        f"near duplicates (default: {NEAR_TOLERANCE})",
+    )
+    parser.add_argument(
+        "--dedupe-report",
+        type=Path,
+        default=DUPLICATES_OUTPATH,
+        help=f"Where to write the duplicate report (default: {DUPLICATES_OUTPATH})",
+    )
+    parser.add_argument(
+        "--profile",
+        type=Path,
+        help="Record wall/CPU time, rows, bytes and peak RSS per build stage "
+        "and write them to this file",
+    )
+    parser.add_argument(
+        "--profile-format",
+        choices=profiling.PROFILE_FORMATS,
+        default="json",
+        help="json report, or chrome for a trace viewable in chrome://tracing "
+        "or Perfetto (default: json)",
+    )
+    parser.add_argument(
+        "--cprofile",
+        action="store_true",
+        help="With --profile, also run cProfile around the parse, metadata "
+        "decode, concat and export stages and write <profile>.<stage>.prof",
+    )
+    parser.add_argument(
+        "--csv-engine",
+        choices=CSV_ENGINES,
+        default="c",
+        help="pandas CSV parser; pyarrow parses multi-threaded (default: c)",
+    )
+    return parser
+
+
+def start_profiling(args: argparse.Namespace) -> None:
+    """
+    Enable stage profiling if requested with --profile.
+    """
+    if args.profile:
+        profiling.enable(CPROFILE_STAGES if args.cprofile else None)
+    elif args.cprofile:
+        logger.warning("--cprofile has no effect without --profile")
+
+
+def finish_profiling(args: argparse.Namespace) -> None:
+    """
+    Write the profile requested with --profile.
+    """
+    profiler = profiling.current()
+    if args.profile and profiler is not None:
+        profiler.write(args.profile, args.profile_format)
+
+
+def run_build(args: argparse.Namespace) -> None:
+    """Run the build with the options from build_argument_parser."""
+    manifest = None
+    if args.incremental:
+        manifest = BuildManifest.load(args.cache_dir, PARSER_KEY)
+
+    df = walk_funding_csvs(
+        DATA_DIR,
+        ignore_list=[CSV_OUTPATH],
+        manifest=manifest,
+        workers=args.workers,
+        engine=args.csv_engine,
+    )
 
     if df.empty:
         logger.warning("No data to export")
         return
 
-    json_export(df, json_outpath)
+    df = dedupe_stage(df, args)
+
+    options = output_options(args)
+    if outputs_up_to_date(manifest, options):
+        logger.info("No source changes since the last build; outputs are up to date")
+    else:
+        export_funding_data(df, args.compress, manifest)
+        if manifest is not None:
+            manifest.record_outputs(options)
+
+    if manifest is not None and manifest.dirty:
+        manifest.save()
 
-    df_csv = df.copy()
-    df_csv["amount"] = df_csv["amount"].fillna(0)
-    df_csv.set_index(REQ_COLS[0], drop=True, inplace=True)
-    df_csv.to_csv(csv_outpath)
-    logger.info(f"Exported to {csv_outpath}")
+
+def main() -> None:
+    """Main function to process funding CSVs and export to JSON, CSV and Parquet."""
+    args = build_argument_parser().parse_args()
+    start_profiling(args)
+    try:
+        run_build(args)
+    finally:
+        finish_profiling(args)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,193 @@
+import hashlib
+import json
+import logging
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional, Union
+
+import pandas as pd
+from pandas import DataFrame
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = "manifest.json"
+FRAMES_DIR = "frames"
+
+
+def file_digest(file_path: Union[str, Path]) -> str:
+    """
+    Compute the SHA-256 content hash of a file.
+
+    Args:
+        file_path: Path to the file
+
+    Returns:
+        Hex digest of the file contents
+    """
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class BuildManifest:
+    """
+    Manifest of source files and their cached parsed frames.
+
+    Each entry records the content hash, mtime, size and row count of a source
+    CSV. The parsed DataFrame is pickled under the cache directory, keyed by the
+    content hash, so an unchanged file never has to be parsed again.
+    """
+
+    def __init__(self, cache_dir: Union[str, Path], parser_key: str):
+        self.cache_dir = Path(cache_dir)
+        self.parser_key = parser_key
+        self.files: Dict[str, Dict[str, Any]] = {}
+        # Options the outputs were last written with (see record_outputs)
+        self.outputs: Optional[Dict[str, Any]] = None
+        # `changed` means the set of parsed frames differs from the last build;
+        # `dirty` means only the manifest itself needs to be written back.
+        self.changed = False
+        self.dirty = False
+
+    @classmethod
+    def load(cls, cache_dir: Union[str, Path], parser_key: str) -> "BuildManifest":
+        """
+        Load the manifest from the cache directory.
+
+        A missing or unreadable manifest, or one written by a different parser,
+        yields an empty manifest so that every file is parsed again.
+        """
+        manifest = cls(cache_dir, parser_key)
+        manifest_path = manifest.cache_dir / MANIFEST_NAME
+        try:
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return manifest
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning(f"Ignoring unreadable manifest at {manifest_path}: {e}")
+            return manifest
+
+        if data.get("parser_key") != parser_key:
+            logger.info("Parser changed since last build; ignoring cached frames")
+            return manifest
+
+        manifest.files = data.get("files", {})
+        manifest.outputs = data.get("outputs")
+        return manifest
+
+    def save(self) -> None:
+        """Write the manifest and drop cached frames no longer referenced."""
+        frames_dir = self.cache_dir / FRAMES_DIR
+        frames_dir.mkdir(parents=True, exist_ok=True)
+
+        with open(self.cache_dir / MANIFEST_NAME, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "parser_key": self.parser_key,
+                    "files": self.files,
+                    "outputs": self.outputs,
+                },
+                f,
+                indent=2,
+                sort_keys=True,
+            )
+
+        referenced = {entry["frame"] for entry in self.files.values()}
+        for frame_path in frames_dir.glob("*.pkl"):
+            if frame_path.name not in referenced:
+                frame_path.unlink()
+
+    def record_outputs(self, options: Dict[str, Any]) -> None:
+        """
+        Remember the options the outputs were just written with, so that a
+        later build only skips the export if they are unchanged.
+
+        Args:
+            options: JSON-serializable options that affect the outputs
+        """
+        if options != self.outputs:
+            self.outputs = options
+            self.dirty = True
+
+    def _frame_path(self, frame: str) -> Path:
+        return self.cache_dir / FRAMES_DIR / frame
+
+    def lookup(self, file_path: Union[str, Path]) -> Optional[DataFrame]:
+        """
+        Return the cached frame for a file if its contents are unchanged.
+
+        The mtime and size are checked first so that unchanged files are not
+        even hashed. When they differ (e.g. after a fresh checkout) the content
+        hash decides, and the stored mtime is refreshed on a match.
+
+        Args:
+            file_path: Path to the source CSV
+
+        Returns:
+            The cached DataFrame, or None if the file must be parsed again
+        """
+        key = str(file_path)
+        entry = self.files.get(key)
+        if entry is None:
+            return None
+
+        stat = Path(file_path).stat()
+        if entry["mtime_ns"] != stat.st_mtime_ns or entry["size"] != stat.st_size:
+            if file_digest(file_path) != entry["sha256"]:
+                return None
+            entry["mtime_ns"] = stat.st_mtime_ns
+            entry["size"] = stat.st_size
+            self.dirty = True
+
+        try:
+            return pd.read_pickle(self._frame_path(entry["frame"]))
+        except Exception as e:
+            logger.warning(f"Cached frame for {file_path} is unusable: {e}")
+            return None
+
+    def store(self, file_path: Union[str, Path], df: DataFrame) -> None:
+        """
+        Record a freshly parsed file and cache its frame.
+
+        Args:
+            file_path: Path to the source CSV
+            df: The parsed DataFrame
+        """
+        stat = Path(file_path).stat()
+        sha256 = file_digest(file_path)
+
+        # Frames carry their source path, so identical files still need their
+        # own cache entry.
+        frame = hashlib.sha256(f"{file_path}:{sha256}".encode()).hexdigest() + ".pkl"
+        frame_path = self._frame_path(frame)
+        frame_path.parent.mkdir(parents=True, exist_ok=True)
+        df.to_pickle(frame_path)
+
+        self.files[str(file_path)] = {
+            "sha256": sha256,
+            "frame": frame,
+            "mtime_ns": stat.st_mtime_ns,
+            "size": stat.st_size,
+            "rows": len(df),
+        }
+        self.changed = self.dirty = True
+
+    def prune(self, seen_paths: Iterable[Union[str, Path]]) -> int:
+        """
+        Forget files that no longer exist in the source tree.
+
+        Args:
+            seen_paths: Paths found during the current walk
+
+        Returns:
+            Number of entries removed
+        """
+        seen = set(str(p) for p in seen_paths)
+        removed = [key for key in self.files if key not in seen]
+        for key in removed:
+            del self.files[key]
+        if removed:
+            self.changed = self.dirty = True
+        return len(removed)
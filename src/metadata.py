@@ -0,0 +1,108 @@
+import json
+import logging
+from typing import Any, Dict, List, Optional
+
+import orjson
+import pandas as pd
+from pandas import DataFrame
+
+logger = logging.getLogger(__name__)
+
+# Well-known metadata keys promoted to their own typed columns
+METADATA_KEYS = {
+    "application_name": "string",
+    "application_url": "string",
+    "token_amount": "float64",
+    "token_unit": "string",
+}
+METADATA_COL = "metadata_json"
+MAX_LOGGED_INVALID = 5
+
+
+def loads_metadata(value: Any) -> Any:
+    """
+    Decode a single metadata cell.
+
+    orjson handles the common case; anything it rejects that the standard
+    library accepts (NaN literals, integers beyond 64 bits) falls back to json
+    so the decoded values are exactly what json.loads would return.
+
+    Raises:
+        ValueError: If the cell is not a string or not valid JSON
+    """
+    if not isinstance(value, str):
+        raise ValueError(f"expected a JSON string, got {type(value).__name__}")
+    try:
+        return orjson.loads(value)
+    except orjson.JSONDecodeError:
+        return json.loads(value)
+
+
+def decode_metadata(dataframe: DataFrame, source: Optional[str] = None) -> DataFrame:
+    """
+    Decode the metadata column of a DataFrame in a single pass.
+
+    Adds the decoded object as METADATA_COL and one typed column per key in
+    METADATA_KEYS.
+    Invalid cells decode to an empty object and are reported in one warning.
+
+    Args:
+        dataframe: DataFrame with a raw JSON `metadata` column
+        source: Where the rows came from, for log messages
+
+    Returns:
+        The same DataFrame with the decoded columns added
+    """
+    decoded: List[Any] = []
+    invalid: List[Any] = []
+    for value in dataframe["metadata"].tolist():
+        try:
+            decoded.append(loads_metadata(value))
+        except ValueError:
+            invalid.append(value)
+            decoded.append({})
+
+    if invalid:
+        location = f" in {source}" if source else ""
+        samples = ", ".join(repr(value) for value in invalid[:MAX_LOGGED_INVALID])
+        logger.warning(
+            f"Invalid JSON in metadata for {len(invalid)} row(s){location}: {samples}"
+        )
+
+    objects: List[Dict[str, Any]] = [
+        metadata if isinstance(metadata, dict) else {} for metadata in decoded
+    ]
+
+    dataframe[METADATA_COL] = decoded
+    for key, dtype in METADATA_KEYS.items():
+        values = pd.Series(
+            [metadata.get(key) for metadata in objects],
+            index=dataframe.index,
+            dtype=object,
+        )
+        if dtype == "float64":
+            dataframe[key] = pd.to_numeric(values, errors="coerce").astype(dtype)
+        else:
+            dataframe[key] = values.astype(dtype)
+    return dataframe
+
+
+def metadata_to_map(metadata: Any) -> Optional[List[tuple]]:
+    """
+    Convert decoded metadata into key/value pairs for an Arrow map column.
+
+    String values are kept as-is and everything else is JSON-encoded, since
+    metadata values are not uniformly typed across funders.
+
+    Args:
+        metadata: A decoded metadata object
+
+    Returns:
+        List of (key, value) pairs, or None if the metadata is not an object
+    """
+    if not isinstance(metadata, dict):
+        return None
+    return [
+        (key, item if isinstance(item, str) else json.dumps(item))
+        for key, item in metadata.items()
+    ]
@@ -0,0 +1,116 @@
+import heapq
+import unicodedata
+from array import array
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+# Suggestions scoring below this trigram similarity are not worth showing
+MIN_SCORE = 0.4
+
+
+def normalize(name: str) -> str:
+    """
+    Normalize a project name or alias for matching: case-folded, without
+    accents, separators or punctuation, so "Uniswap Labs", "uniswap-labs"
+    and "uniswap_labs" share a key. Letters and digits of any script are
+    kept, so non-Latin names keep distinct keys.
+    """
+    decomposed = unicodedata.normalize("NFKD", name.casefold())
+    return "".join(char for char in decomposed if char.isalnum())
+
+
+def trigrams(key: str) -> Set[str]:
+    """
+    Trigrams of a normalized key, padded so that short keys still have some
+    and the first and last characters weigh more.
+    """
+    padded = f"$${key}$"
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+class ProjectNameIndex:
+    """
+    Lookup structure for suggesting valid project names.
+
+    Every project name and alias (e.g. a display name) is reduced to a
+    normalized key. Keys map straight to their projects, so differences in
+    case and punctuation resolve with one dict lookup. Other misspellings are
+    ranked by the similarity (Dice coefficient) of their trigrams, gathered
+    from an inverted index so that only keys sharing a trigram with the query
+    are scored.
+    """
+
+    def __init__(self, names: Iterable[str], aliases: Optional[Dict[str, str]] = None):
+        """
+        Args:
+            names: Valid project names
+            aliases: Alternative spellings, mapped to the project name they
+                stand for
+        """
+        self.exact: Dict[str, Set[str]] = {}
+        for name, key in [(name, normalize(name)) for name in names] + [
+            (name, normalize(alias)) for alias, name in (aliases or {}).items()
+        ]:
+            if key:
+                self.exact.setdefault(key, set()).add(name)
+
+        self.keys: List[str] = list(self.exact)
+        self.sizes = array("H")
+        postings: Dict[str, array] = {}
+        for key_id, key in enumerate(self.keys):
+            grams = trigrams(key)
+            self.sizes.append(min(len(grams), 0xFFFF))
+            for gram in grams:
+                postings.setdefault(gram, array("I")).append(key_id)
+        self.postings = postings
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def suggest(
+        self, name: str, k: int = 3, min_score: float = MIN_SCORE
+    ) -> List[Tuple[str, float]]:
+        """
+        Find the valid project names closest to a name.
+
+        Args:
+            name: Name to look up, usually one not in the directory
+            k: Maximum number of suggestions
+            min_score: Minimum similarity, between 0 and 1, of a suggestion
+
+        Returns:
+            Up to k (project name, score) pairs, best first. Names matching
+            after normalization score 1.0.
+        """
+        key = normalize(name)
+        if not key or k <= 0:
+            return []
+
+        scores: Dict[str, float] = {
+            match: 1.0 for match in self.exact.get(key, ()) if match != name
+        }
+
+        grams = trigrams(key)
+        shared: Counter = Counter()
+        for gram in grams:
+            postings = self.postings.get(gram)
+            if postings is not None:
+                shared.update(postings)
+
+        sizes = self.sizes
+        query_size = len(grams)
+        best = heapq.nlargest(
+            k * 2,
+            shared.items(),
+            key=lambda item: item[1] / (query_size + sizes[item[0]]),
+        )
+        for key_id, count in best:
+            score = 2 * count / (query_size + sizes[key_id])
+            if score < min_score:
+                break
+            for match in self.exact[self.keys[key_id]]:
+                if match != name and score > scores.get(match, 0):
+                    scores[match] = score
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return ranked[:k]
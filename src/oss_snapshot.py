@@ -0,0 +1,133 @@
+import hashlib
+import logging
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+import orjson
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever the snapshot layout changes, so older snapshots are refetched.
+SNAPSHOT_VERSION = 2
+SNAPSHOT_PATH = Path(".cache") / "oss_directory" / "projects.json"
+# Seconds a cached snapshot is used before the directory is fetched again
+SNAPSHOT_MAX_AGE = 6 * 60 * 60
+
+
+def projects_digest(projects: Iterable[Tuple[str, str]]) -> str:
+    """
+    Content hash of (project name, display name) pairs, independent of their
+    order.
+    """
+    lines = sorted(f"{name}\t{display_name}" for name, display_name in projects)
+    return hashlib.sha256("\n".join(lines).encode("utf-8")).hexdigest()
+
+
+def save_snapshot(path: Path, projects: Dict[str, str]) -> None:
+    """
+    Write project names and display names to a snapshot file.
+
+    The snapshot holds the projects sorted by name, the time they were fetched
+    and their content hash, which is checked when the snapshot is loaded.
+
+    Args:
+        path: Snapshot file to write; replaced atomically
+        projects: Display name of each project, by project name
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    snapshot = {
+        "version": SNAPSHOT_VERSION,
+        "fetched_at": time.time(),
+        "sha256": projects_digest(projects.items()),
+        "projects": dict(sorted(projects.items())),
+    }
+    tmp_path = path.with_name(path.name + ".tmp")
+    tmp_path.write_bytes(orjson.dumps(snapshot))
+    tmp_path.replace(path)
+
+
+def load_snapshot(path: Path) -> Tuple[Dict[str, str], float]:
+    """
+    Read project names and display names from a snapshot file.
+
+    Args:
+        path: Snapshot file written by save_snapshot
+
+    Returns:
+        The display name of each project, by project name, and the time they
+        were fetched
+
+    Raises:
+        FileNotFoundError: If the snapshot does not exist
+        ValueError: If the snapshot is unreadable, from another version or
+            fails its content hash check
+    """
+    try:
+        snapshot = orjson.loads(path.read_bytes())
+    except orjson.JSONDecodeError as e:
+        raise ValueError(f"Snapshot {path} is not valid JSON: {e}") from e
+
+    if not isinstance(snapshot, dict) or snapshot.get("version") != SNAPSHOT_VERSION:
+        raise ValueError(f"Snapshot {path} has an unsupported version")
+    projects = snapshot.get("projects")
+    if not isinstance(projects, dict):
+        raise ValueError(f"Snapshot {path} has no project table")
+    if projects_digest(projects.items()) != snapshot.get("sha256"):
+        raise ValueError(f"Snapshot {path} failed its content hash check")
+    return projects, float(snapshot.get("fetched_at", 0))
+
+
+def load_oss_projects(
+    fetch: Callable[[], Dict[str, str]],
+    snapshot: Optional[Path] = None,
+    cache_path: Path = SNAPSHOT_PATH,
+    max_age: float = SNAPSHOT_MAX_AGE,
+    refresh: bool = False,
+) -> Dict[str, str]:
+    """
+    Load the OSS Directory projects, fetching them only when needed.
+
+    With an explicit snapshot, names are read from it and nothing is fetched.
+    Otherwise the cached snapshot is used while it is younger than max_age;
+    when it is older, missing or invalid the directory is fetched and the
+    cache rewritten. If the fetch fails, an expired cache is used instead.
+
+    Args:
+        fetch: Function returning the display name of each OSS Directory
+            project, by project name
+        snapshot: Snapshot file to use offline
+        cache_path: Snapshot file used as a cache between runs
+        max_age: Seconds a cached snapshot stays fresh
+        refresh: Fetch even if the cache is fresh
+
+    Returns:
+        Display name of each valid project, by project name
+    """
+    if snapshot is not None:
+        projects, _ = load_snapshot(snapshot)
+        logger.info(f"Loaded {len(projects)} projects from snapshot {snapshot}")
+        return projects
+
+    cached = None
+    try:
+        cached = load_snapshot(cache_path)
+    except FileNotFoundError:
+        pass
+    except ValueError as e:
+        logger.warning(f"Ignoring cached snapshot: {e}")
+
+    if cached is not None and not refresh and time.time() - cached[1] < max_age:
+        logger.info(f"Using cached snapshot {cache_path} ({len(cached[0])} projects)")
+        return cached[0]
+
+    try:
+        projects = fetch()
+    except Exception as e:
+        if cached is None:
+            raise
+        logger.warning(f"Fetch failed, using expired snapshot {cache_path}: {e}")
+        return cached[0]
+
+    save_snapshot(cache_path, projects)
+    return projects
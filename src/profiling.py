@@ -0,0 +1,240 @@
+"""
+Opt-in per-stage instrumentation for the funding data build.
+
+Stages are timed with `with stage("name") as record:`; the block may add
+`rows` and `bytes` to the record. Nothing is recorded unless enable() was
+called, so instrumented code costs next to nothing in normal builds.
+"""
+
+import cProfile
+import json
+import logging
+import os
+import pstats
+import sys
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Union
+
+try:
+    import resource
+except ImportError:  # not available on Windows; peak RSS is then not reported
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+PROFILE_FORMATS = ["json", "chrome"]
+
+
+def peak_rss() -> Optional[int]:
+    """
+    Peak resident set size of this process so far, in bytes.
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class Profiler:
+    """
+    Records wall time, CPU time, rows, bytes and peak RSS for each stage.
+
+    With cprofile_stages, those stages additionally run under cProfile; the
+    statistics of every occurrence of a stage are accumulated into one
+    profile. A stage nested in a profiled stage is not profiled separately.
+    Statistics recorded by worker processes (see cprofile_stats) are merged
+    into the same profiles when they are written.
+    """
+
+    def __init__(self, cprofile_stages: Optional[List[str]] = None):
+        self.started_at = time.time()
+        self.started_cpu = time.process_time()
+        self.records: List[Dict[str, Any]] = []
+        self.cprofile_stages = set(cprofile_stages or [])
+        self.cprofiles: Dict[str, cProfile.Profile] = {}
+        self.worker_cprofiles: Dict[str, List[Dict]] = defaultdict(list)
+        self._profiling = False
+
+    @contextmanager
+    def stage(self, name: str, **fields: Any) -> Iterator[Dict[str, Any]]:
+        record: Dict[str, Any] = {"name": name, **fields}
+        profile = None
+        if name in self.cprofile_stages and not self._profiling:
+            profile = self.cprofiles.setdefault(name, cProfile.Profile())
+            self._profiling = True
+
+        rss_before = peak_rss()
+        start = time.time()
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        if profile is not None:
+            profile.enable()
+        try:
+            yield record
+        finally:
+            if profile is not None:
+                profile.disable()
+                self._profiling = False
+            record["start"] = start
+            record["wall_time"] = time.perf_counter() - wall
+            record["cpu_time"] = time.process_time() - cpu
+            record["pid"] = os.getpid()
+            rss_after = peak_rss()
+            if rss_after is not None:
+                record["peak_rss"] = rss_after
+                record["peak_rss_growth"] = rss_after - rss_before
+            self.records.append(record)
+
+    def cprofile_stats(self) -> Dict[str, Dict]:
+        """
+        The raw cProfile statistics of each profiled stage, which unlike the
+        profiles themselves can be returned from a worker process.
+        """
+        stats = {}
+        for name, profile in self.cprofiles.items():
+            profile.create_stats()
+            stats[name] = profile.stats
+        return stats
+
+    def merged_cprofile(self, name: str) -> pstats.Stats:
+        """
+        The statistics of a stage from this process and all workers.
+        """
+        stats = pstats.Stats()
+        if name in self.cprofiles:
+            stats.add(self.cprofiles[name])
+        for raw in self.worker_cprofiles.get(name, []):
+            worker = pstats.Stats()
+            worker.stats = raw
+            worker.get_top_level_stats()
+            stats.add(worker)
+        return stats
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Totals per stage name: occurrences, wall and CPU time, rows and bytes.
+        """
+        totals: Dict[str, Dict[str, Any]] = defaultdict(
+            lambda: {"count": 0, "wall_time": 0.0, "cpu_time": 0.0}
+        )
+        for record in self.records:
+            total = totals[record["name"]]
+            total["count"] += 1
+            total["wall_time"] += record["wall_time"]
+            total["cpu_time"] += record["cpu_time"]
+            for field in ("rows", "bytes"):
+                if field in record:
+                    total[field] = total.get(field, 0) + record[field]
+        return dict(totals)
+
+    def report(self) -> Dict[str, Any]:
+        """
+        Build the machine-readable profile of the build so far.
+        """
+        return {
+            "started_at": self.started_at,
+            "wall_time": time.time() - self.started_at,
+            "cpu_time": time.process_time() - self.started_cpu,
+            "peak_rss": peak_rss(),
+            "summary": self.summary(),
+            "stages": sorted(self.records, key=lambda record: record["start"]),
+        }
+
+    def chrome_trace(self) -> Dict[str, Any]:
+        """
+        The stages as Chrome trace events, viewable in chrome://tracing or
+        Perfetto. Stages run by worker processes appear on their own track.
+        """
+        events = []
+        for record in self.records:
+            args = {
+                key: value
+                for key, value in record.items()
+                if key not in ("name", "start", "wall_time", "pid")
+            }
+            events.append(
+                {
+                    "name": record["name"],
+                    "cat": "build",
+                    "ph": "X",
+                    "ts": (record["start"] - self.started_at) * 1e6,
+                    "dur": record["wall_time"] * 1e6,
+                    "pid": record["pid"],
+                    "tid": record["pid"],
+                    "args": args,
+                }
+            )
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def write(self, path: Union[str, Path], output_format: str = "json") -> None:
+        """
+        Write the report (or Chrome trace) and any cProfile statistics, which
+        go next to it as <path stem>.<stage>.prof.
+        """
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        data = self.chrome_trace() if output_format == "chrome" else self.report()
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2, default=str)
+        logger.info(f"Exported build profile to {path}")
+
+        for name in {**self.cprofiles, **self.worker_cprofiles}:
+            stats_path = path.with_name(f"{path.stem}.{name}.prof")
+            self.merged_cprofile(name).dump_stats(stats_path)
+            logger.info(f"Exported cProfile statistics of {name} to {stats_path}")
+
+
+_profiler: Optional[Profiler] = None
+
+
+def enable(cprofile_stages: Optional[List[str]] = None) -> Profiler:
+    """
+    Start recording stages in this process, discarding earlier records.
+    """
+    global _profiler
+    _profiler = Profiler(cprofile_stages)
+    return _profiler
+
+
+def enabled() -> bool:
+    return _profiler is not None
+
+
+def current() -> Optional[Profiler]:
+    return _profiler
+
+
+@contextmanager
+def stage(name: str, **fields: Any) -> Iterator[Dict[str, Any]]:
+    """
+    Record a stage if profiling is enabled; otherwise just run the block.
+
+    Args:
+        name: Stage name, e.g. "parse"
+        fields: Extra values stored with the record, e.g. file=<path>
+
+    Yields:
+        The record, to which the block may add "rows" and "bytes"
+    """
+    if _profiler is None:
+        yield {}
+        return
+    with _profiler.stage(name, **fields) as record:
+        yield record
+
+
+def add_records(
+    records: List[Dict[str, Any]], cprofile_stats: Optional[Dict[str, Dict]] = None
+) -> None:
+    """
+    Add stages, and optionally their cProfile statistics (from
+    Profiler.cprofile_stats), recorded in a worker process.
+    """
+    if _profiler is not None:
+        _profiler.records.extend(records)
+        for name, stats in (cprofile_stats or {}).items():
+            _profiler.worker_cprofiles[name].append(stats)
@@ -0,0 +1,247 @@
+import json
+import logging
+import pickle
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from pandas import DataFrame
+
+from dedupe import DUPLICATE_COL, missing_to_none
+from manifest import BuildManifest
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever ROLLUPS or the partial format changes, so that cached
+# per-file partials are recomputed.
+ROLLUP_VERSION = 1
+PARTIALS_DIR = "rollups"
+# name: (group-by columns, column whose distinct values are counted, name of
+# that count in the output)
+ROLLUPS = {
+    "by_project": (["to_project_name"], "from_funder_name", "funders"),
+    "by_funder_pool": (
+        ["from_funder_name", "grant_pool_name"],
+        "to_project_name",
+        "projects",
+    ),
+    "by_month": (["month"], "to_project_name", "projects"),
+}
+ROLLUP_TYPES = {
+    "to_project_name": pa.string(),
+    "from_funder_name": pa.string(),
+    "grant_pool_name": pa.string(),
+    "month": pa.string(),
+}
+
+# {rollup name: {group key: [grants, amount, distinct values]}}
+Partials = Dict[str, Dict[Tuple[Any, ...], List[Any]]]
+
+
+def file_partials(frame: DataFrame) -> Partials:
+    """
+    Aggregate the rows of one source file for every rollup.
+
+    Partials keep the distinct values themselves rather than their count, so
+    that partials of several files can be merged exactly.
+
+    Args:
+        frame: Rows of one source CSV, as loaded by load_funding_csv
+
+    Returns:
+        Grants, summed amount and distinct values per group for each rollup
+    """
+    frame = frame.assign(
+        amount=frame["amount"].fillna(0),
+        month=frame["funding_date"].str[:7],
+    )
+    partials: Partials = {}
+    for name, (keys, distinct, _) in ROLLUPS.items():
+        groups: Dict[Tuple[Any, ...], List[Any]] = {}
+        columns = [frame[key].tolist() for key in keys]
+        for *key, amount, value in zip(
+            *columns, frame["amount"].tolist(), frame[distinct].tolist()
+        ):
+            key = tuple(missing_to_none(part) for part in key)
+            group = groups.get(key)
+            if group is None:
+                group = groups[key] = [0, 0.0, set()]
+            group[0] += 1
+            group[1] += amount
+            value = missing_to_none(value)
+            if value is not None:
+                group[2].add(value)
+        partials[name] = groups
+    return partials
+
+
+def merge_partials(partials: List[Partials]) -> Partials:
+    """
+    Merge per-file partials, in order, into the partials of the whole dataset.
+    """
+    merged: Partials = {name: {} for name in ROLLUPS}
+    for partial in partials:
+        for name, groups in partial.items():
+            target = merged[name]
+            for key, (grants, amount, values) in groups.items():
+                group = target.get(key)
+                if group is None:
+                    target[key] = [grants, amount, set(values)]
+                    continue
+                group[0] += grants
+                group[1] += amount
+                group[2] |= values
+    return merged
+
+
+def rollup_records(name: str, groups: Dict[Tuple[Any, ...], List[Any]]) -> List[Dict]:
+    """
+    Turn the merged groups of a rollup into output records, sorted by key.
+    """
+    keys, _, count_name = ROLLUPS[name]
+
+    def sort_key(key: Tuple[Any, ...]) -> Tuple:
+        return tuple((part is None, part or "") for part in key)
+
+    return [
+        {
+            **dict(zip(keys, key)),
+            "grants": grants,
+            "amount": amount,
+            count_name: len(values),
+        }
+        for key, (grants, amount, values) in sorted(
+            groups.items(), key=lambda item: sort_key(item[0])
+        )
+    ]
+
+
+class PartialsCache:
+    """
+    Per-file rollup partials cached next to the incremental build manifest.
+
+    Partials are keyed by the manifest's frame name, which changes with the
+    file's content, so only files re-parsed in this build are aggregated
+    again. Partials are only cached for files whose rows are all present;
+    a file that lost rows to the dedupe stage is aggregated on every build.
+    """
+
+    def __init__(self, manifest: BuildManifest):
+        self.manifest = manifest
+        self.cache_dir = manifest.cache_dir / PARTIALS_DIR
+
+    def _path(self, file_path: str, rows: int) -> Optional[Path]:
+        entry = self.manifest.files.get(file_path)
+        if entry is None or entry.get("rows") != rows:
+            return None
+        return self.cache_dir / entry["frame"]
+
+    def lookup(self, file_path: str, rows: int) -> Optional[Partials]:
+        path = self._path(file_path, rows)
+        if path is None:
+            return None
+        try:
+            with open(path, "rb") as f:
+                version, partials = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Cached rollup partials for {file_path} are unusable: {e}")
+            return None
+        return partials if version == ROLLUP_VERSION else None
+
+    def store(self, file_path: str, rows: int, partials: Partials) -> None:
+        path = self._path(file_path, rows)
+        if path is None:
+            return
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "wb") as f:
+            pickle.dump((ROLLUP_VERSION, partials), f)
+
+    def prune(self) -> None:
+        """Drop partials of files no longer in the manifest."""
+        referenced = {entry["frame"] for entry in self.manifest.files.values()}
+        for path in self.cache_dir.glob("*"):
+            if path.name not in referenced:
+                path.unlink()
+
+
+def rollup_paths(rollups_dir: Union[str, Path]) -> List[Path]:
+    """
+    Paths of the files write_rollups creates.
+    """
+    return [
+        Path(rollups_dir) / f"{name}{suffix}"
+        for name in ROLLUPS
+        for suffix in (".json", ".parquet")
+    ]
+
+
+def write_rollups(
+    dataframe: DataFrame,
+    rollups_dir: Union[str, Path],
+    manifest: Optional[BuildManifest] = None,
+) -> None:
+    """
+    Write the rollup tables as JSON and Parquet.
+
+    Each table holds the number of grants, the summed amount and a distinct
+    count (funders per project, projects otherwise) per group. Rollups are
+    merged from per-file partials; with a manifest, partials of unchanged
+    files are reused from the cache, so only changed files are aggregated.
+    Rows flagged as duplicates (DUPLICATE_COL) are not counted, so the totals
+    match those of a build that drops them.
+
+    Args:
+        dataframe: Combined DataFrame returned by walk_funding_csvs
+        rollups_dir: Directory to write <rollup>.json and <rollup>.parquet to
+        manifest: Build manifest of an incremental build, or None
+    """
+    if DUPLICATE_COL in dataframe.columns:
+        dataframe = dataframe.loc[~dataframe[DUPLICATE_COL]].reset_index(drop=True)
+
+    cache = PartialsCache(manifest) if manifest is not None else None
+    indices = dataframe.groupby("file_path", sort=False).indices
+
+    # Merge in walk order, so that amounts are summed in the same order on
+    # every build, whichever partials came from the cache.
+    partials = []
+    reused = 0
+    for file_path in dataframe["file_path"].unique():
+        index = indices[file_path]
+        partial = cache.lookup(file_path, len(index)) if cache is not None else None
+        if partial is None:
+            partial = file_partials(dataframe.take(index))
+            if cache is not None:
+                cache.store(file_path, len(index), partial)
+        else:
+            reused += 1
+        partials.append(partial)
+    if cache is not None:
+        cache.prune()
+        logger.info(f"Rollups: {reused} cached, {len(partials) - reused} aggregated")
+
+    rollups_dir = Path(rollups_dir)
+    rollups_dir.mkdir(parents=True, exist_ok=True)
+    for name, groups in merge_partials(partials).items():
+        keys, _, count_name = ROLLUPS[name]
+        records = rollup_records(name, groups)
+
+        with open(rollups_dir / f"{name}.json", "w", encoding="utf-8") as f:
+            json.dump(records, f, indent=2)
+
+        schema = pa.schema(
+            [(key, ROLLUP_TYPES[key]) for key in keys]
+            + [
+                ("grants", pa.int64()),
+                ("amount", pa.float64()),
+                (count_name, pa.int64()),
+            ]
+        )
+        pq.write_table(
+            pa.Table.from_pylist(records, schema=schema),
+            rollups_dir / f"{name}.parquet",
+        )
+
+    logger.info(f"Exported rollups to {rollups_dir}")
@@ -1,18 +1,32 @@
 import argparse
 import csv
+import glob
+import json
 import sys
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import Dict, List, Set
+from typing import Any, Dict, List, Optional, Set
 
 from ossdirectory import fetch_data
 from ossdirectory.fetch import OSSDirectory
 
+from name_index import ProjectNameIndex
+from oss_snapshot import SNAPSHOT_MAX_AGE, SNAPSHOT_PATH, load_oss_projects
 
-def fetch_oss_projects() -> Set[str]:
-    """Fetch all project names from the OSS Directory."""
+REPORT_FORMATS = ["text", "json", "markdown"]
+DEFAULT_SUGGESTIONS = 3
+
+# Project set shared by the worker processes of validate_files
+_worker_projects: Set[str] = set()
+
+
+def fetch_oss_projects() -> Dict[str, str]:
+    """Fetch the display name of every OSS Directory project, by project name."""
     data: OSSDirectory = fetch_data()
-    return {project["name"] for project in data.projects}
+    return {
+        project["name"]: project.get("display_name") or "" for project in data.projects
+    }
 
 
 def validate_csv(csv_path: Path, oss_projects: Set[str]) -> Dict[str, List[str]]:
@@ -25,60 +39,323 @@ def validate_csv(csv_path: Path, oss_projects: Set[str]) -> Dict[str, List[str]]
 
     Returns:
         Dictionary with 'valid' and 'invalid' project lists
+
+    Raises:
+        FileNotFoundError: If the CSV file does not exist
+        csv.Error: If the CSV file cannot be parsed
     """
     results = defaultdict(list)
 
+    with csv_path.open("r", encoding="utf-8") as file:
+        csv_reader = csv.DictReader(file)
+        for row in csv_reader:
+            project_name = row.get("to_project_name", "").strip()
+            if not project_name:
+                continue
+
+            category = "valid" if project_name in oss_projects else "invalid"
+            results[category].append(project_name)
+
+    return dict(results)
+
+
+def expand_paths(patterns: List[str]) -> List[Path]:
+    """
+    Expand CSV paths and glob patterns (e.g. "data/funders/*/uploads/*.csv").
+
+    Patterns that match nothing are kept as-is so that they are reported as
+    missing files. Duplicates are dropped, keeping the first occurrence.
+
+    Args:
+        patterns: Paths or glob patterns
+
+    Returns:
+        List of CSV paths
+    """
+    paths: Dict[Path, None] = {}
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern, recursive=True))
+        for match in matches or [pattern]:
+            paths.setdefault(Path(match))
+    return list(paths)
+
+
+def _init_worker(oss_projects: Set[str]) -> None:
+    global _worker_projects
+    _worker_projects = oss_projects
+
+
+def validate_file(
+    csv_path: Path, oss_projects: Optional[Set[str]] = None
+) -> Dict[str, Any]:
+    """
+    Validate one CSV file and summarize the outcome for a report.
+
+    Args:
+        csv_path: Path to the CSV file
+        oss_projects: Set of valid project names; defaults to the set shared
+            with the worker process
+
+    Returns:
+        Report entry with the path, valid and invalid counts, the sorted
+        invalid project names and, if the file could not be read, an error
+    """
+    if oss_projects is None:
+        oss_projects = _worker_projects
     try:
-        with csv_path.open("r", encoding="utf-8") as file:
-            csv_reader = csv.DictReader(file)
-            for row in csv_reader:
-                project_name = row.get("to_project_name", "").strip()
-                if not project_name:
-                    continue
-
-                category = "valid" if project_name in oss_projects else "invalid"
-                results[category].append(project_name)
+        results = validate_csv(csv_path, oss_projects)
     except FileNotFoundError:
-        print(f"Error: File '{csv_path}' not found.")
-        sys.exit(1)
-    except csv.Error as e:
-        print(f"Error reading CSV file: {e}")
-        sys.exit(1)
+        return {"path": str(csv_path), "error": f"File '{csv_path}' not found."}
+    except (csv.Error, UnicodeDecodeError) as e:
+        return {"path": str(csv_path), "error": f"Error reading CSV file: {e}"}
 
-    return dict(results)
+    return {
+        "path": str(csv_path),
+        "valid": len(results.get("valid", [])),
+        "invalid": len(results.get("invalid", [])),
+        "invalid_projects": sorted(results.get("invalid", [])),
+    }
+
+
+def validate_files(
+    csv_paths: List[Path], oss_projects: Set[str], workers: int = 1
+) -> List[Dict[str, Any]]:
+    """
+    Validate several CSV files against one project set.
+
+    Args:
+        csv_paths: Paths of the CSV files
+        oss_projects: Set of valid project names
+        workers: Number of worker processes; 1 validates serially in this
+            process and 0 uses one worker per CPU. The project set is sent to
+            each worker once.
+
+    Returns:
+        One report entry per file (see validate_file), in the order given
+    """
+    if workers != 1 and len(csv_paths) > 1:
+        with ProcessPoolExecutor(
+            max_workers=workers or None,
+            initializer=_init_worker,
+            initargs=(oss_projects,),
+        ) as executor:
+            return list(executor.map(validate_file, csv_paths))
+    return [validate_file(csv_path, oss_projects) for csv_path in csv_paths]
+
+
+def build_name_index(projects: Dict[str, str]) -> ProjectNameIndex:
+    """
+    Index project names, with their display names as aliases, for suggestions.
+    """
+    aliases = {
+        display_name: name for name, display_name in projects.items() if display_name
+    }
+    return ProjectNameIndex(projects, aliases)
 
 
-def display_results(results: Dict[str, List[str]]) -> None:
-    """Display validation results in a formatted way."""
-    print("\nValidation Results:")
-    print(f"Valid projects: {len(results.get('valid', []))}")
-    print(f"Invalid projects: {len(results.get('invalid', []))}")
+def add_suggestions(
+    entries: List[Dict[str, Any]], index: ProjectNameIndex, k: int
+) -> None:
+    """
+    Add the closest valid project names for each invalid name to report
+    entries, as a "suggestions" mapping of invalid name to suggested names.
+
+    Each distinct invalid name is looked up once, however many files list it.
+
+    Args:
+        entries: Report entries returned by validate_files; updated in place
+        index: Index of the valid project names
+        k: Maximum number of suggestions per name
+    """
+    suggestions: Dict[str, List[str]] = {}
+    for entry in entries:
+        for project in entry.get("invalid_projects", []):
+            if project not in suggestions:
+                suggestions[project] = [name for name, _ in index.suggest(project, k)]
+        entry["suggestions"] = {
+            project: suggestions[project]
+            for project in entry.get("invalid_projects", [])
+            if suggestions[project]
+        }
+
+
+def describe_invalid(entry: Dict[str, Any], project: str) -> str:
+    """
+    Format an invalid project name with its suggestions, if any.
+    """
+    suggested = entry.get("suggestions", {}).get(project)
+    if not suggested:
+        return project
+    return f"{project} (did you mean: {', '.join(suggested)}?)"
+
+
+def failed(entry: Dict[str, Any]) -> bool:
+    return "error" in entry or entry["invalid"] > 0
+
+
+def summarize(entries: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Build the aggregated report for a batch of validated files.
+    """
+    return {
+        "files": entries,
+        "summary": {
+            "files": len(entries),
+            "failed_files": sum(failed(entry) for entry in entries),
+            "valid": sum(entry.get("valid", 0) for entry in entries),
+            "invalid": sum(entry.get("invalid", 0) for entry in entries),
+        },
+    }
+
+
+def format_markdown(report: Dict[str, Any]) -> str:
+    """
+    Render an aggregated report as the Markdown posted on pull requests.
+    """
+    lines = ["# 🔍 CSV Validation Results", ""]
+    for entry in report["files"]:
+        if not failed(entry):
+            continue
+        name = Path(entry["path"]).name
+        if "error" in entry:
+            lines += [f"## ❌ [`{name}`]({entry['path']}) - ERROR", ""]
+            lines += [entry["error"], "", "---"]
+            continue
+        lines += [f"## ❌ [`{name}`]({entry['path']}) - FAILED", ""]
+        lines += ["**Invalid project names:**", "", "```"]
+        lines += [
+            f"- {describe_invalid(entry, project)}"
+            for project in entry["invalid_projects"]
+        ]
+        lines += ["```", "", "---"]
+
+    summary = report["summary"]
+    if summary["failed_files"] == 0:
+        lines += ["## ✅ All CSV Files Passed Validation", ""]
+        lines.append(
+            f"All {summary['files']} CSV files contain valid project names "
+            "recognized in the OSO database."
+        )
+    else:
+        lines += [
+            f"## ❌ Summary: {summary['failed_files']} of {summary['files']} "
+            "files failed validation",
+            "",
+            "This PR cannot be merged until **all** project names are valid.",
+        ]
+    return "\n".join(lines) + "\n"
+
 
-    if results.get("invalid"):
+def display_results(entry: Dict[str, Any]) -> None:
+    """Display the validation results of one file in a formatted way."""
+    print(f"\nValidation Results for '{entry['path']}':")
+    if "error" in entry:
+        print(f"Error: {entry['error']}")
+        return
+    print(f"Valid projects: {entry['valid']}")
+    print(f"Invalid projects: {entry['invalid']}")
+
+    if entry["invalid_projects"]:
         print("\nThe following project names don't exist in the OSS Directory:")
-        for project in sorted(results["invalid"]):
-            print(f"- {project}")
+        for project in entry["invalid_projects"]:
+            print(f"- {describe_invalid(entry, project)}")
 
 
 def main():
     """Main entry point for the script."""
     parser = argparse.ArgumentParser(
-        description="Validate project names in a CSV file against the OSS Directory."
+        description="Validate project names in CSV files against the OSS Directory."
+    )
+    parser.add_argument(
+        "csv_files",
+        nargs="+",
+        help="Paths or glob patterns of the CSV files containing project names",
+    )
+    parser.add_argument(
+        "--format",
+        choices=REPORT_FORMATS,
+        default="text",
+        help="Report format (default: text)",
+    )
+    parser.add_argument(
+        "--output",
+        type=Path,
+        help="Write the report to this file instead of stdout",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of processes used to validate files (0 = one per CPU, default: 1)",
+    )
+    parser.add_argument(
+        "--suggestions",
+        type=int,
+        default=DEFAULT_SUGGESTIONS,
+        help="Closest valid project names suggested for each invalid name "
+        f"(0 = none, default: {DEFAULT_SUGGESTIONS})",
+    )
+    parser.add_argument(
+        "--snapshot",
+        type=Path,
+        help="Validate offline against this project snapshot instead of fetching",
+    )
+    parser.add_argument(
+        "--cache",
+        type=Path,
+        default=SNAPSHOT_PATH,
+        help=f"Snapshot reused between runs (default: {SNAPSHOT_PATH})",
     )
     parser.add_argument(
-        "csv_file", type=Path, help="Path to the CSV file containing project names"
+        "--max-age",
+        type=float,
+        default=SNAPSHOT_MAX_AGE,
+        help="Seconds before the cached snapshot is refetched "
+        f"(default: {SNAPSHOT_MAX_AGE})",
+    )
+    parser.add_argument(
+        "--refresh",
+        action="store_true",
+        help="Fetch the OSS Directory even if the cached snapshot is fresh",
     )
     args = parser.parse_args()
 
-    print("Fetching project data from OSS directory...")
-    oss_projects = fetch_oss_projects()
+    # Keep stdout for the report itself when it is machine readable
+    status = sys.stdout if args.format == "text" else sys.stderr
+
+    print("Loading project data from OSS directory...", file=status)
+    projects = load_oss_projects(
+        fetch_oss_projects,
+        snapshot=args.snapshot,
+        cache_path=args.cache,
+        max_age=args.max_age,
+        refresh=args.refresh,
+    )
+
+    csv_paths = expand_paths(args.csv_files)
+    print(f"Validating projects in {len(csv_paths)} file(s)...", file=status)
+    entries = validate_files(csv_paths, set(projects), args.workers)
+    if args.suggestions > 0 and any(entry.get("invalid") for entry in entries):
+        add_suggestions(entries, build_name_index(projects), args.suggestions)
+    report = summarize(entries)
 
-    print(f"Validating projects in '{args.csv_file}'...")
-    results = validate_csv(args.csv_file, oss_projects)
+    if args.format == "text":
+        output = None
+        for entry in report["files"]:
+            display_results(entry)
+    elif args.format == "json":
+        output = json.dumps(report, indent=2) + "\n"
+    else:
+        output = format_markdown(report)
 
-    display_results(results)
+    if output is not None:
+        if args.output:
+            args.output.write_text(output, encoding="utf-8")
+            print(f"Report written to {args.output}", file=status)
+        else:
+            sys.stdout.write(output)
 
-    sys.exit(1 if results.get("invalid") else 0)
+    sys.exit(1 if report["summary"]["failed_files"] else 0)
 
 
 if __name__ == "__main__":